@@ -1,13 +1,24 @@
-import os
-from typing import Dict
-import sendgrid
-from sendgrid.helpers.mail import Email, Mail, Content, To
+import html
+import re
+from pydantic import BaseModel, Field
 from utils.config import Config
+from utils.email_sender import EmailSender, get_email_sender
+from utils.markdown_renderer import render_markdown_cached
 from utils.model_providers import GeminiProvider
+from agents.writer_agent import ReportData
+
+class EmailContent(BaseModel):
+    subject: str = Field(description="The email subject line.")
+    html_body: str = Field(description="The complete HTML body of the email.")
 
 class EmailAgent:
-    def __init__(self, model_provider):
+    SUBJECT_PREFIX = "Research Report: "
+    MAX_SUBJECT_LENGTH = 100
+
+    def __init__(self, model_provider, sender: EmailSender = None):
         self.model_provider = model_provider
+        self.sender = sender or get_email_sender()
+        self.use_cache = "email" in Config.LLM_CACHE_AGENTS
         
         self.instructions = (
             "You format research reports for email delivery. Create a clean, well-formatted email "
@@ -15,24 +26,16 @@ class EmailAgent:
             "'subject' and 'html_body' fields."
         )
 
-    async def run(self, report: str) -> dict:
-        prompt = f"""
-        Convert this research report into a well-formatted email with subject and HTML body:
-        
-        {report}
-        """
-        
-        email_content = await self.model_provider.generate_content(
-            prompt=prompt,
-            system_prompt=self.instructions
-        )
-        
-        # Parse the response
-        subject, html_body = self._parse_email_response(email_content)
+    async def run(self, report: ReportData) -> dict:
+        # Rendering locally is instant and deterministic; the LLM path is kept as an opt-in
+        if Config.EMAIL_USE_LLM:
+            subject, html_body = await self._compose_with_llm(report.markdown_report)
+        else:
+            subject, html_body = self._subject(report.short_summary), self._render_html(report.markdown_report)
         
         # Send email if SendGrid is configured
         if Config.SENDGRID_API_KEY:
-            return await self._send_email(subject, html_body)
+            return await self.sender.send(subject, html_body)
         else:
             return {
                 "status": "success",
@@ -40,44 +43,37 @@ class EmailAgent:
                 "content_preview": f"Subject: {subject}\n\n{html_body[:200]}..."
             }
 
-    def _parse_email_response(self, response: str) -> tuple:
-        """Parse the email response to extract subject and body"""
-        import json
-        import re
-        
-        # Try to extract JSON from the response
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            try:
-                data = json.loads(json_match.group())
-                return data.get('subject', 'Research Report'), data.get('html_body', response)
-            except json.JSONDecodeError:
-                pass
+    def _subject(self, short_summary: str) -> str:
+        """The summary's first sentence, shortened at a word boundary to fit a subject line"""
+        summary = re.sub(r"\s+", " ", short_summary).strip()
+        first_sentence = re.split(r"(?<=[.!?])\s", summary, maxsplit=1)[0].rstrip(".")
+        subject = self.SUBJECT_PREFIX + first_sentence
+        if len(subject) > self.MAX_SUBJECT_LENGTH:
+            subject = subject[:self.MAX_SUBJECT_LENGTH - 1].rsplit(" ", 1)[0] + "…"
+        return subject
+
+    def _render_html(self, markdown_report: str) -> str:
+        return (
+            "<html><body style=\"font-family: Arial, Helvetica, sans-serif; line-height: 1.6; color: #1e293b; "
+            "max-width: 720px; margin: 0 auto; padding: 16px;\">"
+            f"{render_markdown_cached(markdown_report)}"
+            "</body></html>"
+        )
+
+    async def _compose_with_llm(self, report: str) -> tuple:
+        prompt = f"""
+        Convert this research report into a well-formatted email with subject and HTML body:
         
-        # Fallback if JSON parsing fails
-        lines = response.split('\n')
-        subject = "Research Report"
-        body = response
+        {report}
+        """
         
-        for i, line in enumerate(lines):
-            if line.startswith("Subject:") and i == 0:
-                subject = line.replace("Subject:", "").strip()
-                body = '\n'.join(lines[i+1:])
-                break
+        email_content = await self.model_provider.generate_structured(
+            prompt=prompt,
+            schema=EmailContent,
+            system_prompt=self.instructions,
+            use_cache=self.use_cache
+        )
         
-        return subject, f"<html><body><pre>{body}</pre></body></html>"
-
-    async def _send_email(self, subject: str, html_body: str) -> Dict[str, str]:
-        """Send an email with the given subject and HTML body"""
-        try:
-            sg = sendgrid.SendGridAPIClient(api_key=Config.SENDGRID_API_KEY)
-            from_email = Email(Config.FROM_EMAIL)
-            to_email = To(Config.TO_EMAIL)
-            content = Content("text/html", html_body)
-            mail = Mail(from_email, to_email, subject, content)
-            
-            response = sg.client.mail.send.post(request_body=mail.get())
-            print(f"Email response: {response.status_code}")
-            return {"status": "success", "message": f"Email sent successfully (Status: {response.status_code})"}
-        except Exception as e:
-            return {"status": "error", "message": f"Failed to send email: {str(e)}"}
\ No newline at end of file
+        if email_content is not None:
+            return email_content.subject, email_content.html_body
+        return "Research Report", f"<html><body><pre>{html.escape(report)}</pre></body></html>"
@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
+from utils.config import Config
 from utils.model_providers import GeminiProvider
+from utils.near_duplicates import select_distinct
 
 class WebSearchItem(BaseModel):
     reason: str = Field(description="Your reasoning for why this search is important to the query.")
@@ -11,66 +13,43 @@ class WebSearchPlan(BaseModel):
 class PlannerAgent:
     def __init__(self, model_provider):
         self.model_provider = model_provider
+        self.use_cache = "planner" in Config.LLM_CACHE_AGENTS
         self.how_many_searches = 5
+        # Extra candidates requested so near-duplicates can be dropped without shrinking the plan
+        self.spare_searches = Config.PLANNER_SPARE_SEARCHES
         
         self.instructions = (
             f"You are a helpful research assistant. Given a query, come up with a set of web searches "
-            f"to perform to best answer the query. Output {self.how_many_searches} terms to query for. "
+            f"to perform to best answer the query. Output as many distinct terms to query for as the request asks for. "
             f"Return the results as a JSON object with a 'searches' array containing objects with 'reason' and 'query' fields."
         )
 
-    async def run(self, query: str) -> WebSearchPlan:
-        prompt = f"Query: {query}\n\nPlease create a search plan with {self.how_many_searches} search queries in JSON format."
-        
-        response = await self.model_provider.generate_content(
+    async def run(self, query: str, how_many: int = None) -> tuple[WebSearchPlan, int]:
+        """Plan `how_many` (default `how_many_searches`) distinct searches, best first.
+
+        The model proposes `spare_searches` extra candidates so near-duplicates can be
+        dropped; if too few distinct ones remain, the plan is topped up with default
+        searches. Returns the plan and how many of the model's searches were dropped.
+        """
+        how_many = how_many or self.how_many_searches
+        candidates = how_many + self.spare_searches
+        prompt = f"Query: {query}\n\nPlease create a search plan with {candidates} search queries in JSON format."
+        
+        plan = await self.model_provider.generate_structured(
             prompt=prompt,
-            system_prompt=self.instructions
+            schema=WebSearchPlan,
+            system_prompt=self.instructions,
+            use_cache=self.use_cache
         )
+        searches = plan.searches if plan is not None else []
+        kept, removed = select_distinct([item.query for item in searches], how_many, topic=query)
         
-        # Parse the response to create search items
-        searches = self._parse_response(response)
-        
-        # If we couldn't parse enough searches, create default ones
-        if len(searches) < self.how_many_searches:
-            searches = self._create_default_searches(query)
-        
-        return WebSearchPlan(searches=searches[:self.how_many_searches])
-    
-    def _parse_response(self, response: str) -> list:
-        """Parse the AI response to extract search items"""
-        searches = []
-        
-        # Try to find JSON-like structure
-        import json
-        import re
-        
-        # Look for JSON pattern
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            try:
-                data = json.loads(json_match.group())
-                if 'searches' in data and isinstance(data['searches'], list):
-                    for item in data['searches']:
-                        if 'query' in item and 'reason' in item:
-                            searches.append(WebSearchItem(
-                                reason=item['reason'],
-                                query=item['query']
-                            ))
-            except json.JSONDecodeError:
-                pass
-        
-        # If no JSON found, try to parse line by line
-        if not searches:
-            lines = response.split('\n')
-            for line in lines:
-                if ':' in line and ('search' in line.lower() or 'query' in line.lower()):
-                    parts = line.split(':', 1)
-                    if len(parts) == 2:
-                        query = parts[1].strip()
-                        reason = f"Researching {query} to answer the main query"
-                        searches.append(WebSearchItem(reason=reason, query=query))
+        # If parsing failed or too many searches were near-duplicates, top up with default ones
+        if len(kept) < how_many:
+            searches = searches + self._create_default_searches(query)
+            kept, _ = select_distinct([item.query for item in searches], how_many, topic=query)
         
-        return searches
+        return WebSearchPlan(searches=[searches[i] for i in kept]), removed
     
     def _create_default_searches(self, query: str) -> list:
         """Create default search items if parsing fails"""
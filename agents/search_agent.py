@@ -1,21 +1,47 @@
-import aiohttp
-import wikipediaapi
-from urllib.parse import quote
+import asyncio
+import re
+from pydantic import BaseModel, Field
+from utils.config import Config
+from utils.fanout import as_completed_until
+from utils.http_pool import HttpPool, get_http_pool
 from utils.model_providers import GeminiProvider
+from utils.passage_retrieval import top_passages
+from utils.search_backends import SearchRouter, create_search_router
+from utils.search_cache import SearchCache, get_search_cache
+from utils.single_flight import SingleFlight
+from utils.tracing import tracer
+
+class BatchSummary(BaseModel):
+    id: int = Field(description="The number of the search being summarized")
+    summary: str = Field(description="The 2-3 paragraph summary of that search's results")
+
+class BatchSummaries(BaseModel):
+    summaries: list[BatchSummary] = Field(description="One summary per search")
 
 class SearchAgent:
-    def __init__(self, model_provider):
+    # Shared by every instance so identical requests from concurrent runs are coalesced too
+    requests_in_flight = SingleFlight()
+
+    def __init__(self, model_provider, http_pool: HttpPool = None, search_cache: SearchCache = None,
+                 search_router: SearchRouter = None):
         self.model_provider = model_provider
-        self.wiki = wikipediaapi.Wikipedia(
-            user_agent='ResearchAssistant/1.0 (research@example.com)',
-            language='en'
-        )
+        self.http_pool = http_pool or get_http_pool()
+        self.search_cache = search_cache or get_search_cache()
+        self.use_cache = "search" in Config.LLM_CACHE_AGENTS
+        self.search_router = search_router or create_search_router(self.http_pool, self.requests_in_flight)
         
         self.instructions = (
             "You are a research assistant. Given a search term, you search the web for that term and "
             "produce a concise summary of the results. The summary must be 2-3 paragraphs and less than 300 "
             "words. Capture the main points. Write succinctly."
         )
+        
+        self.batch_instructions = (
+            "You are a research assistant. You will be given the search results for several numbered search "
+            "terms. For each one, produce a concise summary of its results. Each summary must be 2-3 paragraphs "
+            "and less than 300 words. Capture the main points. Write succinctly. Return a JSON object with a "
+            "'summaries' array containing one object per search with 'id' (the search number) and 'summary' fields."
+        )
 
     async def run(self, input_text: str) -> str:
         # Extract search term from input
@@ -32,10 +58,113 @@ class SearchAgent:
         if not search_term:
             search_term = input_text
         
-        # Perform search using Wikipedia and web search
-        search_results = await self._perform_search(search_term)
+        with tracer.span("search_agent.run", search_term=search_term):
+            # Perform search using Wikipedia and web search
+            search_results = await self._traced_search(search_term, reason)
+            
+            with tracer.span("search.summarize"):
+                return await self._summarize(search_term, reason, search_results)
+
+    async def run_batch(self, items: list[tuple[str, str]], coverage: float = None, timeout: float = None) -> list:
+        """Search for every (search term, reason) pair, then summarize them all in one LLM call.
+
+        Items the batched response doesn't cover (or all of them, if it can't be parsed)
+        are summarized with individual calls instead. With `coverage` and `timeout`, only
+        searches that finished before enough succeeded or time ran out are summarized;
+        the others are cancelled and come back as None. `timeout` covers summarizing
+        too: if the summaries aren't back by then, the raw search results are returned.
+        """
+        with tracer.span("search_agent.run_batch", searches=len(items)):
+            return await self._run_batch(items, coverage, timeout)
+
+    async def _run_batch(self, items: list[tuple[str, str]], coverage: float = None, timeout: float = None) -> list:
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        if coverage is None:
+            search_results = await asyncio.gather(
+                *[self._traced_search(search_term, reason) for search_term, reason in items],
+                return_exceptions=True
+            )
+        else:
+            search_results = [None] * len(items)
+            async for i, result in as_completed_until(
+                [self._traced_search(search_term, reason) for search_term, reason in items], coverage, timeout
+            ):
+                search_results[i] = result
+            tracer.current_span().set_attribute("searches_cancelled", search_results.count(None))
+        search_results = [
+            "" if isinstance(result, Exception) else result for result in search_results
+        ]
         
-        # Generate summary
+        # Summarize only what was fetched, then put the summaries back in plan order
+        fetched = [i for i, result in enumerate(search_results) if result is not None]
+        fetched_items, fetched_results = [items[i] for i in fetched], [search_results[i] for i in fetched]
+        summarize = self._summarize_batch(fetched_items, fetched_results)
+        if deadline is None:
+            batch = await summarize
+        else:
+            try:
+                batch = await asyncio.wait_for(summarize, max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                print(f"Summaries not ready within the {timeout}s search budget, using the raw search results")
+                tracer.current_span().set_attribute("summaries_timed_out", True)
+                batch = [
+                    f"Search results for '{search_term}':\n{results}" if results else ""
+                    for (search_term, _), results in zip(fetched_items, fetched_results)
+                ]
+        summaries = [None] * len(items)
+        for i, summary in zip(fetched, batch):
+            summaries[i] = summary
+        return summaries
+
+    async def _summarize_batch(self, items: list[tuple[str, str]], search_results: list[str]) -> list[str]:
+        if not items:
+            return []
+        
+        sections = []
+        for i, ((search_term, reason), results) in enumerate(zip(items, search_results)):
+            sections.append(
+                f"### Search {i+1}\n"
+                f"Search term: {search_term}\n"
+                f"Reason for searching: {reason}\n"
+                f"Results:\n{results or 'No results found; use general knowledge.'}"
+            )
+        prompt = (
+            f"Summarize each of the following {len(items)} searches.\n\n"
+            + "\n\n".join(sections)
+        )
+        
+        with tracer.span("search.summarize_batch"):
+            batch = await self.model_provider.generate_structured(
+                prompt=prompt,
+                schema=BatchSummaries,
+                system_prompt=self.batch_instructions,
+                use_cache=self.use_cache
+            )
+        summaries = self._batch_by_id(batch, len(items))
+        
+        # Fall back to one call per item for anything the batch didn't answer
+        missing = [i for i, summary in enumerate(summaries) if not summary]
+        if missing:
+            print(f"Batched summary missing {len(missing)}/{len(items)} items, summarizing them individually")
+            tracer.current_span().set_attribute("fallback_items", len(missing))
+            fallbacks = await asyncio.gather(*[
+                self._summarize(items[i][0], items[i][1], search_results[i]) for i in missing
+            ])
+            for i, summary in zip(missing, fallbacks):
+                summaries[i] = summary
+        
+        return summaries
+
+    async def _traced_search(self, search_term: str, reason: str = "") -> str:
+        """_perform_search wrapped in a span measuring the HTTP fetch stage"""
+        with tracer.span("search.fetch", search_term=search_term) as span:
+            search_results = await self._perform_search(search_term, reason)
+            span.set_attribute("result_chars", len(search_results))
+            return search_results
+
+    async def _summarize(self, search_term: str, reason: str, search_results: str) -> str:
+        """Summarize the results for a single search term"""
         if search_results:
             prompt = f"""
             Search results for '{search_term}' (reason: {reason}):
@@ -53,94 +182,75 @@ class SearchAgent:
         
         summary = await self.model_provider.generate_content(
             prompt=prompt,
-            system_prompt=self.instructions
+            system_prompt=self.instructions,
+            use_cache=self.use_cache
         )
         
         return summary
 
-    async def _perform_search(self, query: str) -> str:
+    @staticmethod
+    def _batch_by_id(batch: BatchSummaries, count: int) -> list[str]:
+        """Order the batched summaries by search number; "" marks a missing item"""
+        summaries = [""] * count
+        if batch is None:
+            return summaries
+        for entry in batch.summaries:
+            if 0 < entry.id <= count and entry.summary.strip():
+                summaries[entry.id - 1] = entry.summary.strip()
+        return summaries
+
+    async def _perform_search(self, query: str, reason: str = "") -> str:
         """Perform search using Wikipedia and web search"""
+        raw = await self.search_cache.get(query)
+        if raw is None:
+            raw = await self._fetch(query)
+            await self.search_cache.set(query, raw)
         results = []
         
-        try:
-            # Try Wikipedia first (most reliable)
-            wiki_result = await self._wikipedia_search(query)
-            if wiki_result:
-                results.append(f"Wikipedia: {wiki_result}")
-        except Exception as e:
-            print(f"Wikipedia search error: {e}")
-        
-        try:
-            # Try web search as fallback
-            web_result = await self._web_search(query)
-            if web_result:
-                results.append(f"Web Search: {web_result}")
-        except Exception as e:
-            print(f"Web search error: {e}")
+        wiki_result = await self._wikipedia_result(raw, query, reason)
+        if wiki_result:
+            results.append(f"Wikipedia: {wiki_result}")
+        
+        web_result = self._web_result(raw)
+        if web_result:
+            results.append(f"Web Search: {web_result}")
         
         return "\n\n".join(results) if results else ""
 
-    async def _wikipedia_search(self, query: str) -> str:
-        """Search Wikipedia for information"""
-        try:
-            # Try direct page access first
-            page = self.wiki.page(query)
-            if page.exists():
-                summary = page.summary
-                return summary[:500] + "..." if len(summary) > 500 else summary
-            
-            # If direct page doesn't exist, search for pages using Wikipedia API
-            search_url = f"https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch={quote(query)}&format=json&srlimit=2"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(search_url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        search_results = data.get('query', {}).get('search', [])
-                        
-                        if search_results:
-                            # Get the first result
-                            page_title = search_results[0]['title']
-                            page = self.wiki.page(page_title)
-                            if page.exists():
-                                summary = page.summary
-                                return summary[:500] + "..." if len(summary) > 500 else summary
-                            
-                            # If we can't get the page, return the snippet
-                            snippet = search_results[0].get('snippet', '')
-                            # Clean HTML tags from snippet
-                            import re
-                            clean_snippet = re.sub('<[^<]+?>', '', snippet)
-                            return clean_snippet + "..."
-        except Exception as e:
-            print(f"Wikipedia API error: {e}")
+    async def _fetch(self, query: str) -> dict:
+        """Fetch the raw data for a query from every configured search backend: an article's text and the top hits"""
+        return await self.search_router.fetch(query)
+
+    async def _wikipedia_result(self, raw: dict, query: str, reason: str = "") -> str:
+        """Format the Wikipedia section from fetched data"""
+        # Only the article's passages most relevant to the search term and reason are passed on.
+        # Tokenizing and scoring a whole article takes tens of milliseconds, so keep it off the event loop
+        if raw.get("page_text"):
+            with tracer.span("search.rank_passages", article_chars=len(raw["page_text"])) as span:
+                passages = await asyncio.to_thread(top_passages, raw["page_text"], query, reason)
+                span.set_attribute("passages", len(passages))
+            return "\n\n".join(passages)
+        
+        # Entries cached before full-text retrieval only hold the lead section
+        summary = raw.get("page_summary")
+        if summary:
+            return summary[:500] + "..." if len(summary) > 500 else summary
         
+        # If we can't get the page, return the snippet
+        if raw["search_hits"]:
+            return self._clean_snippet(raw["search_hits"][0].get('snippet', '')) + "..."
         return ""
 
-    async def _web_search(self, query: str) -> str:
-        """Simple web search using Wikipedia API or DuckDuckGo-like service"""
-        try:
-            # Use Wikipedia search as web search fallback
-            search_url = f"https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch={quote(query)}&format=json&srlimit=3"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(search_url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        search_results = data.get('query', {}).get('search', [])
-                        
-                        if search_results:
-                            results = []
-                            for result in search_results:
-                                title = result.get('title', '')
-                                snippet = result.get('snippet', '')
-                                # Clean HTML tags
-                                import re
-                                clean_snippet = re.sub('<[^<]+?>', '', snippet)
-                                results.append(f"{title}: {clean_snippet}...")
-                            
-                            return "\n".join(results)
-        except Exception as e:
-            print(f"Web search error: {e}")
-        
-        return ""
\ No newline at end of file
+    def _web_result(self, raw: dict) -> str:
+        """Format the Web Search section from fetched search hits"""
+        results = []
+        for result in raw["search_hits"]:
+            title = result.get('title', '')
+            snippet = self._clean_snippet(result.get('snippet', ''))
+            results.append(f"{title}: {snippet}...")
+        return "\n".join(results)
+
+    @staticmethod
+    def _clean_snippet(snippet: str) -> str:
+        """Strip the HTML highlighting tags Wikipedia puts in search snippets"""
+        return re.sub('<[^<]+?>', '', snippet)
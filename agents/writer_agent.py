@@ -1,5 +1,10 @@
+from typing import AsyncGenerator, Union
 from pydantic import BaseModel, Field
+from utils.config import Config
+from utils.context_budget import ContextBudgeter
 from utils.model_providers import GeminiProvider
+from utils.structured_output import StructuredOutputError, extract_json
+from utils.tracing import tracer
 
 class ReportData(BaseModel):
     short_summary: str = Field(description="A short 2-3 sentence summary of the findings.")
@@ -7,8 +12,13 @@ class ReportData(BaseModel):
     follow_up_questions: list[str] = Field(description="Suggested topics to research further")
 
 class WriterAgent:
+    SUMMARY_PREFIX = "SUMMARY:"
+    FOLLOW_UP_HEADING = "## Follow-up Questions"
+
     def __init__(self, model_provider):
         self.model_provider = model_provider
+        self.use_cache = "writer" in Config.LLM_CACHE_AGENTS
+        self.context_budgeter = ContextBudgeter()
         
         self.instructions = (
             "You are a senior researcher tasked with writing a cohesive report for a research query. "
@@ -16,9 +26,18 @@ class WriterAgent:
             "Generate a comprehensive report in markdown format with at least 1000 words. "
             "Return the results as a JSON object with 'short_summary', 'markdown_report', and 'follow_up_questions' fields."
         )
+        
+        # Streaming can't wait for a complete JSON object, so ask for plain markdown with marked sections
+        self.streaming_instructions = (
+            "You are a senior researcher tasked with writing a cohesive report for a research query. "
+            "You will be provided with the original query and research findings.\n"
+            "Generate a comprehensive report in markdown format with at least 1000 words. "
+            f"Write markdown directly, not JSON. The first line must start with '{self.SUMMARY_PREFIX}' followed by a "
+            f"2-3 sentence summary, and the report must end with a '{self.FOLLOW_UP_HEADING}' section listing 3-5 questions as bullet points."
+        )
 
     async def run(self, query: str, search_results: list[str]) -> ReportData:
-        research_text = "\n\n".join([f"## Research Finding {i+1}\n{result}" for i, result in enumerate(search_results)])
+        research_text = self._format_findings(search_results)
         
         prompt = f"""
         Original Query: {query}
@@ -34,43 +53,108 @@ class WriterAgent:
         Return the results in JSON format.
         """
         
-        response = await self.model_provider.generate_content(
+        return await self.model_provider.generate_structured(
             prompt=prompt,
-            system_prompt=self.instructions
+            schema=ReportData,
+            system_prompt=self.instructions,
+            use_cache=self.use_cache,
+            fallback=lambda response: self._fallback_report(response, query)
         )
+
+    def _fallback_report(self, response: str, query: str) -> ReportData:
+        """Keep what the model wrote when no attempt validated: its markdown_report field if it has one, else the raw text"""
+        try:
+            data = extract_json(response)
+        except StructuredOutputError:
+            data = {}
+        markdown_report = data.get("markdown_report")
+        short_summary = data.get("short_summary")
+        return ReportData(
+            short_summary=short_summary if isinstance(short_summary, str) and short_summary.strip()
+            else f"Summary of research on {query}",
+            markdown_report=markdown_report if isinstance(markdown_report, str) and markdown_report.strip()
+            else response,
+            follow_up_questions=self._default_follow_up_questions(query)
+        )
+
+    async def stream(self, query: str, search_results: list[str]) -> AsyncGenerator[Union[str, ReportData], None]:
+        """Stream the report: yields markdown chunks as they arrive, then the parsed ReportData last"""
+        research_text = self._format_findings(search_results)
+        
+        prompt = f"""
+        Original Query: {query}
+        
+        Research Findings:
+        {research_text}
+        
+        Please create a comprehensive research report (1000+ words) in markdown.
+        """
         
-        # Parse the response into the required format
-        return self._parse_response(response, query)
+        response = ""
+        emitted = 0
+        async for chunk in self.model_provider.stream_content(
+            prompt=prompt,
+            system_prompt=self.streaming_instructions,
+            use_cache=self.use_cache
+        ):
+            response += chunk
+            body = self._strip_summary_line(response)
+            if body is not None and len(body) > emitted:
+                yield body[emitted:]
+                emitted = len(body)
+        
+        yield self._parse_streamed_response(response, query)
+
+    def _format_findings(self, search_results: list[str]) -> str:
+        """Fit the findings to the input token budget and number them for the prompt"""
+        findings, stats = self.context_budgeter.fit(search_results)
+        span = tracer.current_span()
+        if span is not None:
+            for key, value in stats.items():
+                span.set_attribute(f"context_{key}", value)
+        return "\n\n".join([f"## Research Finding {i+1}\n{result}" for i, result in enumerate(findings)])
 
-    def _parse_response(self, response: str, query: str) -> ReportData:
-        """Parse the AI response into structured data"""
-        import json
-        import re
+    def _strip_summary_line(self, response: str):
+        """The streamed markdown without the leading summary line, or None while that line is incomplete"""
+        text = response.lstrip()
+        if not text.startswith(self.SUMMARY_PREFIX):
+            # Too short to tell yet whether a summary line is coming
+            if self.SUMMARY_PREFIX.startswith(text):
+                return None
+            return response
+        if "\n" not in text:
+            return None
+        return text.split("\n", 1)[1].lstrip("\n")
+
+    def _parse_streamed_response(self, response: str, query: str) -> ReportData:
+        """Split a streamed markdown response into summary, report and follow-up questions"""
+        text = response.lstrip()
+        short_summary = f"Summary of research on {query}"
+        if text.startswith(self.SUMMARY_PREFIX):
+            first_line, _, text = text.partition("\n")
+            short_summary = first_line[len(self.SUMMARY_PREFIX):].strip() or short_summary
+            text = text.lstrip("\n")
         
-        # Try to extract JSON from the response
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            try:
-                data = json.loads(json_match.group())
-                return ReportData(
-                    short_summary=data.get('short_summary', f"Summary of research on {query}"),
-                    markdown_report=data.get('markdown_report', response),
-                    follow_up_questions=data.get('follow_up_questions', [
-                        f"What are the latest developments in {query}?",
-                        f"How is {query} being applied in industry?",
-                        f"What are the future trends in {query}?"
-                    ])
-                )
-            except json.JSONDecodeError:
-                pass
+        follow_up_questions = []
+        if self.FOLLOW_UP_HEADING in text:
+            section = text.split(self.FOLLOW_UP_HEADING, 1)[1]
+            for line in section.split("\n"):
+                line = line.strip()
+                if line.startswith(("- ", "* ")):
+                    follow_up_questions.append(line[2:].strip())
+                elif line.startswith("#"):
+                    break
         
-        # Fallback if JSON parsing fails
         return ReportData(
-            short_summary=f"Summary of research on {query}",
-            markdown_report=response,
-            follow_up_questions=[
-                f"What are the latest developments in {query}?",
-                f"How is {query} being applied in industry?",
-                f"What are the future trends in {query}?"
-            ]
-        )
\ No newline at end of file
+            short_summary=short_summary,
+            markdown_report=text,
+            follow_up_questions=follow_up_questions or self._default_follow_up_questions(query)
+        )
+
+    @staticmethod
+    def _default_follow_up_questions(query: str) -> list[str]:
+        return [
+            f"What are the latest developments in {query}?",
+            f"How is {query} being applied in industry?",
+            f"What are the future trends in {query}?"
+        ]
@@ -1,14 +1,13 @@
 import gradio as gr
 from dotenv import load_dotenv
-from research_manager import ResearchManager
+from research_manager import ReportUpdate, get_research_manager
+from agents.writer_agent import ReportData
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.markdown_renderer import IncrementalRenderer, remember_rendered, render_markdown_cached
+from utils.report_export import ReportExporter
 import asyncio
-import time
-import tempfile
-import os
 from typing import List
 import json
-import re
-from bs4 import BeautifulSoup
 
 load_dotenv()
 
@@ -254,15 +253,46 @@ body {
 }
 """
 
-async def run_research(query: str):
-    """Run the research process and yield updates"""
-    manager = ResearchManager()
+# Shared by every session: caps how many research runs hit Gemini and Wikipedia at once
+admission = AdmissionController()
+
+async def run_research(query: str, request: gr.Request = None):
+    """Run the research process and yield (progress, report, raw report, ReportData) updates"""
+    status = "Starting research..."
+    report_markdown = ""
+    report_data = None
+    # Renders only what each streamed chunk added instead of the whole report every time
+    renderer = IncrementalRenderer()
+    user = request.session_hash if request is not None and request.session_hash else "anonymous"
+    try:
+        ticket = admission.enqueue(user)
+    except AdmissionRejected as e:
+        yield create_status_display(f"❌ {e}"), format_report(report_markdown), report_markdown, report_data
+        return
     
     try:
+        async for position in admission.wait(ticket):
+            yield create_status_display(f"⏳ Queued: position {position} of {admission.get_stats()['queued']}, research will start automatically..."), format_report(report_markdown), report_markdown, report_data
+        
+        # The manager is shared across sessions; per-run state lives in its RunContext
+        manager = get_research_manager()
         async for update in manager.run(query):
-            yield update
+            if isinstance(update, ReportUpdate):
+                # Stream partial markdown straight into the report panel
+                report_markdown = update.markdown
+                if update.done:
+                    status = "✅ Research complete"
+                    report_data = update.report
+                    remember_rendered(report_markdown, renderer.render(report_markdown))
+                    # The email is still being sent, but that needs no slot: let the next run start
+                    admission.release(ticket)
+            else:
+                status = update
+            yield create_status_display(status), format_report(report_markdown, renderer), report_markdown, report_data
     except Exception as e:
-        yield f"❌ Error during research: {str(e)}"
+        yield create_status_display(f"❌ Error during research: {str(e)}"), format_report(report_markdown), report_markdown, report_data
+    finally:
+        admission.release(ticket)
 
 def create_status_display(status_text: str) -> str:
     """Create formatted status display"""
@@ -275,21 +305,13 @@ def create_status_display(status_text: str) -> str:
     else:
         return f"<div style='color: var(--text); padding: 10px; background: var(--background); border-radius: 8px; border: 1px solid var(--border);'>{status_text}</div>"
 
-def format_report(markdown_text: str) -> str:
+def format_report(markdown_text: str, renderer: IncrementalRenderer = None) -> str:
     """Format the report with better styling"""
     if not markdown_text or markdown_text.startswith("❌"):
         return markdown_text
     
-    # Basic markdown to HTML conversion for better display
-    html_content = markdown_text
-    html_content = html_content.replace("# ", "<h1>").replace("\n#", "</h1>\n<h1>")
-    html_content = html_content.replace("## ", "<h2>").replace("\n##", "</h2>\n<h2>")
-    html_content = html_content.replace("### ", "<h3>").replace("\n###", "</h3>\n<h3>")
-    html_content = html_content.replace("**", "<strong>").replace("**", "</strong>")
-    html_content = html_content.replace("*", "<em>").replace("*", "</em>")
-    html_content = html_content.replace("`", "<code>").replace("`", "</code>")
-    html_content = html_content.replace("\n- ", "\n<li>").replace("\n-", "</li>\n<li>")
-    html_content = html_content.replace("\n", "<br>")
+    # While streaming, the run's renderer only renders the new text; otherwise reuse the cached HTML
+    html_content = renderer.render(markdown_text) if renderer is not None else render_markdown_cached(markdown_text)
     
     return f"""
     <div style="font-family: 'Inter', sans-serif; line-height: 1.6;">
@@ -297,34 +319,20 @@ def format_report(markdown_text: str) -> str:
     </div>
     """
 
-def export_report(report_html: str):
-    """Export report to a temporary file and return the file path"""
-    # Extract text content from HTML
+# Shared by every session; keeps the export directory bounded and reuses identical exports
+exporter = ReportExporter()
 
-    
-    # Try to extract text from HTML
-    try:
-        soup = BeautifulSoup(report_html, 'html.parser')
-        report_text = soup.get_text()
-    except:
-        # Fallback: use regex to remove HTML tags
-        report_text = re.sub('<[^<]+?>', '', report_html)
-    
+EXPORT_FORMATS = {"Markdown": "md", "HTML": "html", "JSON": "json"}
+
+def export_report(report_markdown: str, report_data: ReportData = None, export_format: str = "Markdown"):
+    """Export the report from its raw markdown (plus summary and follow-ups, if known) and return the file path"""
     # If no meaningful content, return None
-    if not report_text or len(report_text.strip()) < 10:
+    if not report_markdown or len(report_markdown.strip()) < 10:
         return None
     
-    # Create a temporary file
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    temp_dir = tempfile.mkdtemp()
-    file_path = os.path.join(temp_dir, f"research_report_{timestamp}.md")
-    
-    # Write the report content to the file
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(report_text)
-    
-    # Return the file path
-    return file_path
+    if report_data is None or report_data.markdown_report != report_markdown:
+        report_data = ReportData(short_summary="", markdown_report=report_markdown, follow_up_questions=[])
+    return exporter.export(report_data, EXPORT_FORMATS.get(export_format, "md"))
 
 def clear_all():
     """Clear all inputs and outputs"""
@@ -381,6 +389,11 @@ with gr.Blocks(
                 run_btn = gr.Button("🚀 Start Research", variant="primary", elem_classes="btn-primary")
                 clear_btn = gr.Button("🗑️ Clear All", elem_classes="btn-secondary")
                 export_btn = gr.Button("📤 Export Report", elem_classes="btn-secondary")
+                export_format = gr.Radio(
+                    choices=list(EXPORT_FORMATS),
+                    value="Markdown",
+                    label="Export Format"
+                )
         
         # Progress Section
         with gr.Column(elem_classes="progress-section"):
@@ -412,53 +425,50 @@ with gr.Blocks(
     
     # Store the report content for export
     current_report = gr.State(value="")
+    current_report_data = gr.State(value=None)
     
     # Event Handlers
     def update_progress(status_text):
         """Update progress display with formatted status"""
         return create_status_display(status_text)
     
-    def update_report(report_text):
-        """Update report display with formatted content"""
-        formatted = format_report(report_text)
-        return formatted, report_text  # Return both formatted HTML and raw text
-    
     # Connect event handlers
+    # Concurrency is governed by `admission` (which can report queue positions), not Gradio's queue
     run_btn.click(
         fn=run_research,
         inputs=[query_input],
-        outputs=[progress_status]
-    ).then(
-        fn=update_report,
-        inputs=[progress_status],
-        outputs=[report_output, current_report]
+        outputs=[progress_status, report_output, current_report, current_report_data],
+        concurrency_limit=None
     )
     
     clear_btn.click(
         fn=clear_all,
         outputs=[query_input, progress_status, report_output]
     ).then(
-        fn=lambda: "",  # Clear the stored report
-        outputs=[current_report]
+        fn=lambda: ("", None),  # Clear the stored report
+        outputs=[current_report, current_report_data]
     )
     
     export_btn.click(
         fn=export_report,
-        inputs=[current_report],
+        inputs=[current_report, current_report_data, export_format],
         outputs=[gr.File(label="Download Report")]
     )
     
     query_input.submit(
         fn=run_research,
         inputs=[query_input],
-        outputs=[progress_status]
-    ).then(
-        fn=update_report,
-        inputs=[progress_status],
-        outputs=[report_output, current_report]
+        outputs=[progress_status, report_output, current_report, current_report_data],
+        concurrency_limit=None
     )
 
 if __name__ == "__main__":
+    # Warm up the shared manager (provider, HTTP pool, agents) before taking traffic
+    try:
+        get_research_manager()
+    except ValueError as e:
+        print(f"Warning: {e}")
+    
     app.launch(
         server_name="0.0.0.0",
         server_port=7860,
@@ -0,0 +1,95 @@
+"""Run research for many queries at once and write each report as it finishes.
+
+Queries are read one per line (blank lines and lines starting with '#' are
+skipped) and run through the shared ResearchManager with bounded concurrency.
+Runs share one search memo, so a sub-search planned by several queries is
+fetched and summarized only once. Reports are written to the output directory as
+they complete, followed by a batch_summary.json:
+
+    python batch_research.py queries.txt --output reports --concurrency 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from dotenv import load_dotenv
+from research_manager import ResearchManager, RunContext, get_research_manager
+from utils.search_cache import SearchCache
+
+load_dotenv()
+
+
+def read_queries(path: str) -> list[str]:
+    """Queries from `path`, skipping comments, blanks and normalized duplicates"""
+    queries = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            query = line.strip()
+            if query and not query.startswith("#"):
+                queries.setdefault(SearchCache.normalize(query), query)
+    return list(queries.values())
+
+
+def report_filename(index: int, query: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")[:60] or "report"
+    return f"{index:03d}-{slug}.md"
+
+
+async def run_batch(queries: list[str], output_dir: str, concurrency: int = 3,
+                    manager: ResearchManager = None, send_email: bool = False) -> list[dict]:
+    """Research every query, writing each report to `output_dir` as soon as it is done"""
+    manager = manager or get_research_manager()
+    os.makedirs(output_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+    search_memo = {}
+    finished = 0
+
+    async def run_one(index: int, query: str) -> dict:
+        nonlocal finished
+        async with semaphore:
+            context = RunContext(query=query, send_email=send_email, search_memo=search_memo)
+            result = {"query": query, "status": "completed", "path": None}
+            try:
+                async for _ in manager.run(query, context):
+                    pass
+                path = os.path.join(output_dir, report_filename(index, query))
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(context.report.markdown_report)
+                result["path"] = path
+            except Exception as e:
+                result.update(status="failed", error=str(e))
+            result["duration"] = round(time.time() - context.started_at, 3)
+            result["shared_searches"] = context.shared_searches
+
+        finished += 1
+        print(f"[{finished}/{len(queries)}] {result['status']}: {query}" + (f" -> {result['path']}" if result["path"] else ""))
+        return result
+
+    results = await asyncio.gather(*[run_one(i + 1, query) for i, query in enumerate(queries)])
+
+    with open(os.path.join(output_dir, "batch_summary.json"), "w", encoding="utf-8") as f:
+        json.dump({"unique_searches": len(search_memo), "runs": results}, f, indent=2)
+    return results
+
+
+async def main(args):
+    queries = read_queries(args.queries)
+    if not queries:
+        print(f"No queries found in {args.queries}")
+        return
+    manager = get_research_manager()
+    try:
+        await run_batch(queries, args.output, args.concurrency, manager, send_email=args.email)
+    finally:
+        await manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run research for every query in a file")
+    parser.add_argument("queries", help="Text file with one query per line")
+    parser.add_argument("--output", default="reports", help="Directory to write reports to")
+    parser.add_argument("--concurrency", type=int, default=3, help="Research runs to execute at once")
+    parser.add_argument("--email", action="store_true", help="Also email each report")
+    asyncio.run(main(parser.parse_args()))
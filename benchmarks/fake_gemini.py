@@ -0,0 +1,119 @@
+import asyncio
+import json
+import re
+from typing import AsyncIterator
+from utils.model_providers import ModelProvider
+from utils.rate_limiter import RateLimiter, estimate_tokens
+
+FILLER = (
+    "Researchers have studied this topic extensively, and the findings point to a number of "
+    "recurring themes that are relevant to the original question. "
+)
+
+
+class FakeGeminiProvider(ModelProvider):
+    """Deterministic local stand-in for GeminiProvider.
+
+    Each call waits `latency` seconds (time to first token) plus the time to emit
+    the response at `tokens_per_second`, and returns canned text shaped like what
+    the calling agent expects, recognized from its system prompt.
+    """
+
+    def __init__(self, latency: float = 0.5, tokens_per_second: float = 200, report_words: int = 1000,
+                 rate_limiter: RateLimiter = None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.report_words = report_words
+        self.rate_limiter = rate_limiter
+        self.calls = 0
+
+    def get_model_name(self) -> str:
+        return "fake-gemini"
+
+    async def generate_content(self, prompt: str, system_prompt: str = None, use_cache: bool = False, **kwargs) -> str:
+        full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+        response = self._respond(prompt, system_prompt or "")
+        if self.rate_limiter is None:
+            await self._simulate(response)
+        else:
+            async with self.rate_limiter.limit(estimate_tokens(full_prompt)):
+                await self._simulate(response)
+        return response
+
+    async def stream_content(self, prompt: str, system_prompt: str = None, use_cache: bool = False, **kwargs) -> AsyncIterator[str]:
+        response = self._respond(prompt, system_prompt or "")
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        chunk_size = 80  # about 20 tokens per chunk
+        for start in range(0, len(response), chunk_size):
+            chunk = response[start:start + chunk_size]
+            await asyncio.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            yield chunk
+
+    async def _simulate(self, response: str):
+        self.calls += 1
+        await asyncio.sleep(self.latency + estimate_tokens(response) / self.tokens_per_second)
+
+    def _respond(self, prompt: str, system_prompt: str) -> str:
+        if "web searches" in system_prompt:
+            return self._plan(prompt)
+        if "'summaries' array" in system_prompt:
+            return self._batch_summaries(prompt)
+        if "SUMMARY:" in system_prompt:
+            return self._markdown_report(prompt)
+        if "'markdown_report'" in system_prompt:
+            return json.dumps({
+                "short_summary": "A deterministic summary produced by the fake provider.",
+                "markdown_report": self._markdown_report(prompt, with_summary_line=False),
+                "follow_up_questions": ["What comes next?", "Who is affected?", "How is it measured?"]
+            })
+        if "email" in system_prompt.lower():
+            return json.dumps({
+                "subject": "Research Report",
+                "html_body": f"<html><body><p>{FILLER * 3}</p></body></html>"
+            })
+        return self._summary(prompt)
+
+    def _plan(self, prompt: str) -> str:
+        match = re.search(r"with (\d+) search queries", prompt)
+        count = int(match.group(1)) if match else 5
+        query_match = re.search(r"Query: (.*)", prompt)
+        query = query_match.group(1).strip() if query_match else "the topic"
+        aspects = ["history", "applications", "criticism", "economics", "future", "ethics", "technology", "policy"]
+        # The first two line up with the recorded fixtures (benchmarks/fixtures/wikipedia.json):
+        # an overview of the query itself, and a phrasing whose page is recorded as missing
+        searches = [
+            {"reason": "Get an overview of the topic", "query": query},
+            {"reason": "Identify the key concepts", "query": f"key concepts of {query}"},
+        ] + [
+            {"reason": f"Cover the {aspect} of the topic", "query": f"{query} {aspect}"}
+            for aspect in aspects * (count // len(aspects) + 1)
+        ]
+        return json.dumps({"searches": searches[:count]})
+
+    def _summary(self, prompt: str) -> str:
+        match = re.search(r"'(.+?)'", prompt)
+        term = match.group(1) if match else "the topic"
+        return f"Summary of {term}. " + FILLER * 6
+
+    def _batch_summaries(self, prompt: str) -> str:
+        terms = re.findall(r"Search term: (.*)", prompt)
+        return json.dumps({
+            "summaries": [
+                {"id": i + 1, "summary": f"Summary of {term.strip()}. " + FILLER * 6}
+                for i, term in enumerate(terms)
+            ]
+        })
+
+    def _markdown_report(self, prompt: str, with_summary_line: bool = True) -> str:
+        paragraph = FILLER * 3
+        sections = []
+        words = 0
+        while words < self.report_words:
+            sections.append(f"## Section {len(sections) + 1}\n\n{paragraph}\n")
+            words += len(paragraph.split())
+        report = "# Research Report\n\n" + "\n".join(sections)
+        report += "\n## Follow-up Questions\n\n- What comes next?\n- Who is affected?\n- How is it measured?\n"
+        if with_summary_line:
+            report = "SUMMARY: A deterministic summary produced by the fake provider.\n\n" + report
+        return report
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import socket
+from aiohttp import web
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "wikipedia.json")
+
+
+class FakeWikipediaServer:
+    """Local HTTP server that answers the Wikipedia action API calls SearchAgent makes.
+
+    Responses are replayed from recorded fixtures keyed by request kind and lowercased
+    term; anything not recorded gets a deterministic synthetic response, so any
+    search plan works offline. Every response is delayed by `latency` seconds.
+    """
+
+    def __init__(self, fixtures_path: str = FIXTURES_PATH, latency: float = 0.1):
+        self.latency = latency
+        self.fixtures = {}
+        if fixtures_path and os.path.exists(fixtures_path):
+            with open(fixtures_path, encoding="utf-8") as f:
+                self.fixtures = json.load(f)
+        self.requests = 0
+        self.replayed = 0
+        self._runner = None
+        self.url = None
+
+    async def start(self) -> str:
+        """Start serving on a free localhost port and return the API URL"""
+        app = web.Application()
+        app.router.add_get("/w/api.php", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        site = web.SockSite(self._runner, sock)
+        await site.start()
+        self.url = f"http://127.0.0.1:{sock.getsockname()[1]}/w/api.php"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        params = request.query
+        if params.get("list") == "search":
+            return web.json_response(self._search(params.get("srsearch", ""), int(params.get("srlimit", "3"))))
+        return web.json_response(self._extract(params.get("titles", "")))
+
+    def _search(self, query: str, limit: int) -> dict:
+        key = f"search:{query.lower()}"
+        if key in self.fixtures:
+            self.replayed += 1
+            hits = self.fixtures[key]
+        else:
+            hits = [
+                {
+                    "title": f"{query.title()} ({i + 1})" if i else query.title(),
+                    "snippet": f"<span class=\"searchmatch\">{query}</span> is discussed in this article, "
+                               f"which covers its background, key ideas and current relevance."
+                }
+                for i in range(3)
+            ]
+        return {"query": {"search": hits[:limit]}}
+
+    def _extract(self, title: str) -> dict:
+        key = f"extract:{title.lower()}"
+        if key in self.fixtures:
+            self.replayed += 1
+            extract = self.fixtures[key]
+        else:
+            extract = (
+                f"{title} is a subject with a long history. " * 3
+                + f"Modern work on {title} focuses on its practical applications and open problems. " * 3
+            )
+        if extract is None:
+            return {"query": {"pages": [{"title": title, "missing": True}]}}
+        return {"query": {"pages": [{"title": title, "extract": extract}]}}
@@ -0,0 +1,263 @@
+"""Offline benchmarks for the research pipeline.
+
+Runs ResearchManager against FakeGeminiProvider and FakeWikipediaServer, so no
+Gemini quota or network access is needed, and times each pipeline stage, the
+end-to-end run, and the agents' response parsers. Results are written as JSON
+so runs from different commits can be compared:
+
+    python -m benchmarks.run_benchmarks --iterations 5
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<earlier run>.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import time
+import timeit
+from utils.config import Config
+from research_manager import ResearchManager, ReportUpdate
+from agents.planner_agent import PlannerAgent, WebSearchPlan
+from agents.writer_agent import WriterAgent, ReportData
+from agents.email_agent import EmailAgent, EmailContent
+from utils.markdown_renderer import IncrementalRenderer, render_markdown
+from utils.structured_output import get_parse_stats, parse_model
+from benchmarks.fake_gemini import FakeGeminiProvider
+from benchmarks.fake_wikipedia import FakeWikipediaServer
+
+QUERIES = [
+    "artificial intelligence in healthcare",
+    "renewable energy",
+    "history of the printing press",
+]
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of `values`"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: list) -> dict:
+    return {
+        "n": len(samples),
+        "mean": statistics.mean(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+async def bench_pipeline(args) -> dict:
+    """Time each stage separately, then full ResearchManager.run calls"""
+    server = FakeWikipediaServer(latency=args.wiki_latency)
+    Config.WIKIPEDIA_API_URL = await server.start()
+    # Only the fake Wikipedia server is available offline
+    Config.SEARCH_BACKENDS = ["wikipedia"]
+    Config.SEARCH_HEDGE_BACKEND = ""
+    Config.SENDGRID_API_KEY = None
+    Config.LLM_CACHE_AGENTS = []
+    Config.ANALYTICS_LOG_PATH = ""
+
+    provider = FakeGeminiProvider(
+        latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        report_words=args.report_words
+    )
+    manager = ResearchManager(model_provider=provider)
+
+    stages = {"plan": [], "search": [], "write": [], "email": []}
+    end_to_end = {"first_report_content": [], "report_ready": [], "total": []}
+    try:
+        for i in range(args.iterations):
+            query = QUERIES[i % len(QUERIES)]
+
+            if not args.warm_cache:
+                manager.search_agent.search_cache.clear()
+            start = time.perf_counter()
+            plan = await manager.plan_searches(query)
+            stages["plan"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            results = [
+                update async for update in manager.perform_searches(plan)
+                if not update.startswith("Completed search")
+            ]
+            stages["search"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            report = await manager.write_report(query, results)
+            stages["write"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await manager.send_email(report)
+            stages["email"].append(time.perf_counter() - start)
+
+            if not args.warm_cache:
+                manager.search_agent.search_cache.clear()
+            start = time.perf_counter()
+            first_content = report_ready = None
+            async for update in manager.run(query):
+                if isinstance(update, ReportUpdate):
+                    now = time.perf_counter() - start
+                    if first_content is None:
+                        first_content = now
+                    if update.done:
+                        report_ready = now
+            end_to_end["total"].append(time.perf_counter() - start)
+            end_to_end["first_report_content"].append(first_content)
+            end_to_end["report_ready"].append(report_ready)
+    finally:
+        await manager.close()
+        await server.stop()
+
+    return {
+        "stages": {name: summarize(samples) for name, samples in stages.items()},
+        "end_to_end": {name: summarize(samples) for name, samples in end_to_end.items()},
+        "llm_calls": provider.calls,
+        "structured_output": get_parse_stats(),
+        "search_backends": manager.search_agent.search_router.get_stats(),
+        "wikipedia_requests": server.requests,
+        "wikipedia_replayed": server.replayed,
+    }
+
+
+# Covers the constructs whose block boundaries the incremental renderer has to get right
+RENDERER_SAMPLE = """# Title
+
+Intro with **bold**, *italics*, `code` and a [link](https://example.com/?a=1&b=2).
+
+- first item
+  continued
+- second item
+
+1. one
+2) two
+
+> quoted
+
+```python
+x = 1
+
+y = 2
+```
+Text right after a fence.
+
+---
+
+Closing paragraph.
+"""
+
+
+def check_incremental_renderer(markdown: str, trials: int = 50, seed: int = 0):
+    """Raise AssertionError unless IncrementalRenderer matches render_markdown however the text is streamed"""
+    rng = random.Random(seed)
+    expected = render_markdown(markdown)
+    for trial in range(trials):
+        renderer = IncrementalRenderer()
+        cuts = sorted(rng.sample(range(1, len(markdown)), min(20, len(markdown) - 1)))
+        for end in cuts + [len(markdown)]:
+            partial = renderer.render(markdown[:end])
+            assert partial == render_markdown(markdown[:end]), f"trial {trial}: mismatch after {end} chars"
+        assert partial == expected
+
+
+def bench_parsers(number: int) -> dict:
+    """Microseconds per call for each agent's response parser (best of 5 repeats)"""
+    provider = FakeGeminiProvider()
+    planner = PlannerAgent(provider)
+    writer = WriterAgent(provider)
+    email = EmailAgent(provider)
+
+    query = QUERIES[0]
+    plan_response = provider._respond(f"Query: {query}\n\nPlease create a search plan with 5 search queries", planner.instructions)
+    report_response = provider._respond(query, writer.instructions)
+    streamed_report = provider._respond(query, writer.streaming_instructions)
+    email_response = provider._respond(query, email.instructions)
+    report = writer._parse_streamed_response(streamed_report, query)
+    # Timing a renderer that gives wrong output would be meaningless, so check it first
+    for markdown in (RENDERER_SAMPLE, report.markdown_report):
+        check_incremental_renderer(markdown)
+
+    cases = {
+        "parse_model(WebSearchPlan)": lambda: parse_model(plan_response, WebSearchPlan),
+        "parse_model(ReportData)": lambda: parse_model(report_response, ReportData),
+        "writer._parse_streamed_response": lambda: writer._parse_streamed_response(streamed_report, query),
+        "parse_model(EmailContent)": lambda: parse_model(email_response, EmailContent),
+        "render_markdown": lambda: render_markdown(report.markdown_report),
+    }
+    return {
+        name: min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+        for name, fn in cases.items()
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict):
+    """Print p50 changes against an earlier results file"""
+    print(f"\nCompared with {baseline.get('git_commit', '?')} ({baseline.get('timestamp', '?')}):")
+    for section in ("stages", "end_to_end"):
+        for name, stats in current["pipeline"][section].items():
+            old = baseline.get("pipeline", {}).get(section, {}).get(name)
+            if old:
+                change = (stats["p50"] - old["p50"]) / old["p50"] * 100 if old["p50"] else 0
+                print(f"  {section}.{name:22s} p50 {old['p50']:.3f}s -> {stats['p50']:.3f}s ({change:+.1f}%)")
+    for name, value in current["parsers"].items():
+        old = baseline.get("parsers", {}).get(name)
+        if old:
+            print(f"  {name:34s} {old:.1f}us -> {value:.1f}us ({(value - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the research pipeline")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake Gemini time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="Fake Gemini output rate")
+    parser.add_argument("--report-words", type=int, default=1000, help="Length of the fake report")
+    parser.add_argument("--wiki-latency", type=float, default=0.1, help="Fake Wikipedia response delay (s)")
+    parser.add_argument("--warm-cache", action="store_true", help="Keep the search cache between runs")
+    parser.add_argument("--parser-iterations", type=int, default=2000)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results"))
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "settings": vars(args),
+        "pipeline": asyncio.run(bench_pipeline(args)),
+        "parsers": bench_parsers(args.parser_iterations),
+    }
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['git_commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    for section in ("stages", "end_to_end"):
+        for name, stats in results["pipeline"][section].items():
+            print(f"{section}.{name:22s} p50 {stats['p50']:.3f}s  p95 {stats['p95']:.3f}s  mean {stats['mean']:.3f}s")
+    for name, value in results["parsers"].items():
+        print(f"{name:34s} {value:.1f}us")
+    print(f"Results written to {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
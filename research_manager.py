@@ -1,59 +1,213 @@
 import asyncio
-from typing import AsyncGenerator
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Optional, Union
+from utils.analytics import Analytics
+from utils.background import BackgroundTaskPool
 from utils.config import Config
-from utils.model_providers import GeminiProvider
+from utils.fanout import adaptive_plan_size, as_completed_until
+from utils.http_pool import get_http_pool
+from utils.model_providers import ModelProvider, get_shared_provider
+from utils.search_cache import SearchCache
+from utils.tracing import tracer
 from agents.planner_agent import PlannerAgent, WebSearchPlan
 from agents.search_agent import SearchAgent
 from agents.writer_agent import WriterAgent, ReportData
 from agents.email_agent import EmailAgent
 
+@dataclass
+class RunContext:
+    """Everything that belongs to a single research run.
+
+    ResearchManager is shared by all sessions and keeps no per-run state itself;
+    each call to `run` works on its own RunContext instead.
+    """
+    query: str
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    trace_id: Optional[str] = None
+    session_id: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    search_plan: Optional[WebSearchPlan] = None
+    duplicate_searches_removed: int = 0
+    searches_cancelled: int = 0
+    search_results: list = field(default_factory=list)
+    report: Optional[ReportData] = None
+    email_result: Optional[dict] = None
+    # Set False to stop after the report (e.g. batch runs)
+    send_email: bool = True
+    # Shared by runs that should search each normalized query only once (see batch_research.py)
+    search_memo: Optional[dict] = None
+    shared_searches: int = 0
+
+@dataclass
+class ReportUpdate:
+    """Report content yielded by ResearchManager.run, as opposed to plain status strings.
+
+    While the writer streams, `markdown` holds the report so far and `delta` the newly
+    added text; the last update has `done=True` and carries the parsed ReportData.
+    """
+    markdown: str
+    delta: str = ""
+    done: bool = False
+    report: Optional[ReportData] = None
+
 class ResearchManager:
-    def __init__(self):
-        Config.validate()
-        self.model_provider = GeminiProvider()
+    def __init__(self, model_provider: ModelProvider = None):
+        # An injected provider (e.g. the benchmark's fake) doesn't need Gemini credentials
+        if model_provider is None:
+            Config.validate()
+        self.model_provider = model_provider or get_shared_provider()
+        self.http_pool = get_http_pool()
+        # Email runs off the critical path; bounded so bursts can't queue unlimited work
+        self.background_tasks = BackgroundTaskPool(
+            max_concurrency=Config.EMAIL_MAX_CONCURRENCY,
+            max_pending=Config.EMAIL_MAX_PENDING
+        )
+        self.analytics = Analytics()
         
         # Initialize agents
         self.planner_agent = PlannerAgent(self.model_provider)
-        self.search_agent = SearchAgent(self.model_provider)
+        self.search_agent = SearchAgent(self.model_provider, self.http_pool)
         self.writer_agent = WriterAgent(self.model_provider)
         self.email_agent = EmailAgent(self.model_provider)
+        
+        response_cache = getattr(self.model_provider, "response_cache", None)
+        if response_cache is not None:
+            self.analytics.register_cache("llm_responses", response_cache.get_stats)
+        self.analytics.register_cache("search_results", self.search_agent.search_cache.get_stats)
+
+    async def run(self, query: str, context: RunContext = None) -> AsyncGenerator[Union[str, ReportUpdate], None]:
+        """Run the deep research process, yielding status strings and ReportUpdates"""
+        context = context or RunContext(query=query)
+        root_span = tracer.start_span("research.run", query=query, run_id=context.run_id)
+        context.trace_id = root_span.trace_id
+        context.session_id = self.analytics.start_session(query)
+        error = None
+        status = 'cancelled'
+        try:
+            # Each step runs with the root span current, so stage spans nest under it
+            async for update in tracer.iterate(root_span, self._run(query, context)):
+                yield update
+            status = 'completed'
+        except Exception as e:
+            error = e
+            status = 'failed'
+            raise
+        finally:
+            tracer.end_span(root_span, error)
+            self.analytics.complete_session(context.session_id, status)
 
-    async def run(self, query: str) -> AsyncGenerator[str, None]:
-        """Run the deep research process, yielding status updates and the final report"""
+    async def _run(self, query: str, context: RunContext) -> AsyncGenerator[Union[str, ReportUpdate], None]:
         yield f"Starting research with {self.model_provider.get_model_name()}..."
         
         # Plan searches
         yield "Planning search strategy..."
-        search_plan = await self.plan_searches(query)
-        yield f"Planned {len(search_plan.searches)} searches, starting execution..."
+        with tracer.span("plan_searches") as span:
+            context.search_plan = await self.plan_searches(query, context)
+            span.set_attribute("searches", len(context.search_plan.searches))
+            span.set_attribute("duplicate_searches_removed", context.duplicate_searches_removed)
+        self.analytics.log_step(
+            context.session_id, "plan_searches", duration=span.duration,
+            metrics={"duplicate_searches_removed": context.duplicate_searches_removed}
+        )
+        yield f"Planned {len(context.search_plan.searches)} searches, starting execution..."
         
         # Perform searches
-        search_results = []
-        async for status_update in self.perform_searches(search_plan):
-            if status_update.startswith("Completed search"):
-                yield status_update
-            else:
-                search_results.append(status_update)
+        span = tracer.start_span("perform_searches", searches=len(context.search_plan.searches))
+        try:
+            async for status_update in tracer.iterate(span, self.perform_searches(context.search_plan, context)):
+                if status_update.startswith("Completed search"):
+                    yield status_update
+                else:
+                    context.search_results.append(status_update)
+            span.set_attribute("shared_searches", context.shared_searches)
+            span.set_attribute("searches_cancelled", context.searches_cancelled)
+        finally:
+            tracer.end_span(span)
+        self.analytics.log_step(context.session_id, "perform_searches", duration=span.duration)
         
         yield "Searches completed, synthesizing report..."
         
-        # Write report
-        report = await self.write_report(query, search_results)
-        yield "Report synthesized, preparing email notification..."
+        # Write report, forwarding partial markdown as it streams in
+        span = tracer.start_span("write_report", streaming=Config.WRITER_STREAMING)
+        try:
+            if Config.WRITER_STREAMING:
+                markdown = ""
+                async for part in tracer.iterate(span, self.writer_agent.stream(query, context.search_results)):
+                    if isinstance(part, ReportData):
+                        context.report = part
+                    else:
+                        if not markdown:
+                            span.set_attribute("time_to_first_content_seconds", span.duration)
+                        markdown += part
+                        yield ReportUpdate(markdown=markdown, delta=part)
+            else:
+                with tracer.use_span(span):
+                    context.report = await self.write_report(query, context.search_results)
+            span.set_attribute("report_chars", len(context.report.markdown_report))
+        finally:
+            tracer.end_span(span)
+        self.analytics.log_step(context.session_id, "write_report", duration=span.duration)
+        
+        # Yield final report as soon as it's written
+        yield ReportUpdate(markdown=context.report.markdown_report, done=True, report=context.report)
+        
+        if not context.send_email:
+            return
         
-        # Send email
-        email_result = await self.send_email(report.markdown_report)
-        yield f"Email status: {email_result['status']}"
+        # Send email in the background and report its status once it's done
+        report = context.report
+        email_submitted_at = time.time()
+        task_id = self.background_tasks.submit("email", lambda: self.send_email(report))
+        if task_id is None:
+            context.email_result = {"status": "skipped", "message": "Email queue is full"}
+            yield "⚠️ Email status: skipped (email queue is full)"
+            return
         
-        # Yield final report
-        yield report.markdown_report
+        yield "Report ready, sending email notification in the background..."
+        task_status = await self.background_tasks.wait(task_id)
+        if task_status["status"] == "completed":
+            context.email_result = task_status["result"]
+        else:
+            context.email_result = {"status": "error", "message": task_status.get("error", "Email task failed")}
+        self.analytics.log_step(
+            context.session_id, "send_email",
+            status='completed' if context.email_result.get("status") == "success" else 'failed',
+            duration=time.time() - email_submitted_at
+        )
+        yield f"Email status: {context.email_result['status']}"
 
-    async def plan_searches(self, query: str) -> WebSearchPlan:
-        """Plan the searches to perform for the query"""
-        return await self.planner_agent.run(query)
+    async def plan_searches(self, query: str, context: RunContext = None) -> WebSearchPlan:
+        """Plan the searches to perform for the query, dropping near-duplicate search terms"""
+        how_many = adaptive_plan_size(query) if Config.SEARCH_ADAPTIVE else self.planner_agent.how_many_searches
+        search_plan, removed = await self.planner_agent.run(query, how_many)
+        if context is not None:
+            context.duplicate_searches_removed = removed
+        return search_plan
 
-    async def perform_searches(self, search_plan: WebSearchPlan) -> AsyncGenerator[str, None]:
+    async def perform_searches(self, search_plan: WebSearchPlan, context: RunContext = None) -> AsyncGenerator[str, None]:
         """Perform the searches for the query"""
+        if context is not None and context.search_memo is not None:
+            async for update in self._perform_shared_searches(search_plan, context):
+                yield update
+            return
+        
+        if Config.SEARCH_ADAPTIVE:
+            async for update in self._perform_searches_until_covered(search_plan, context):
+                yield update
+            return
+        
+        if Config.SEARCH_BATCH_SUMMARIES:
+            summaries = await self.search_agent.run_batch(
+                [(item.query, item.reason) for item in search_plan.searches]
+            )
+            for i, summary in enumerate(summaries):
+                yield summary
+                yield f"Completed search {i+1}/{len(summaries)}"
+            return
+        
         tasks = []
         for item in search_plan.searches:
             input_text = f"Search term: {item.query}\nReason for searching: {item.reason}"
@@ -68,10 +222,101 @@ class ResearchManager:
                 yield f"Search {i+1} failed: {str(e)}"
                 yield f"Completed search {i+1}/{len(tasks)}"
 
+    async def _perform_searches_until_covered(self, search_plan: WebSearchPlan, context: RunContext = None) -> AsyncGenerator[str, None]:
+        """Perform the searches, but stop once SEARCH_COVERAGE of them succeeded or the latency budget ran out.
+
+        Unfinished searches are cancelled, so the report is written from the results in hand.
+        """
+        total = len(search_plan.searches)
+        if Config.SEARCH_BATCH_SUMMARIES:
+            summaries = await self.search_agent.run_batch(
+                [(item.query, item.reason) for item in search_plan.searches],
+                coverage=Config.SEARCH_COVERAGE,
+                timeout=Config.SEARCH_LATENCY_BUDGET
+            )
+            results = [summary for summary in summaries if summary is not None]
+            for i, summary in enumerate(results):
+                yield summary
+                yield f"Completed search {i+1}/{total}"
+        else:
+            tasks = [
+                self.search_agent.run(f"Search term: {item.query}\nReason for searching: {item.reason}")
+                for item in search_plan.searches
+            ]
+            results = []
+            async for i, result in as_completed_until(tasks, Config.SEARCH_COVERAGE, Config.SEARCH_LATENCY_BUDGET):
+                results.append(result)
+                yield f"Search {i+1} failed: {str(result)}" if isinstance(result, Exception) else result
+                yield f"Completed search {len(results)}/{total}"
+        
+        if context is not None:
+            context.searches_cancelled = total - len(results)
+        if len(results) < total:
+            yield f"Completed search {len(results)}/{total} (skipped {total - len(results)} slow searches)"
+    
+    async def _perform_shared_searches(self, search_plan: WebSearchPlan, context: RunContext) -> AsyncGenerator[str, None]:
+        """Perform only the searches no other run sharing `context.search_memo` has started.
+
+        The memo maps each normalized search query to (task, index): the task searching
+        and summarizing a group of new queries, and the query's position in its result.
+        """
+        memo = context.search_memo
+        keys = list(dict.fromkeys(SearchCache.normalize(item.query) for item in search_plan.searches))
+        new_items = {}
+        for item in search_plan.searches:
+            key = SearchCache.normalize(item.query)
+            if key not in memo and key not in new_items:
+                new_items[key] = item
+        context.shared_searches = len(keys) - len(new_items)
+        
+        if new_items:
+            task = asyncio.ensure_future(self._search_items(list(new_items.values())))
+            for index, key in enumerate(new_items):
+                memo[key] = (task, index)
+        
+        for i, key in enumerate(keys):
+            task, index = memo[key]
+            # Shielded: other runs are waiting on the same task
+            summaries = await asyncio.shield(task)
+            yield summaries[index]
+            yield f"Completed search {i+1}/{len(keys)}"
+    
+    async def _search_items(self, items: list) -> list[str]:
+        """Search and summarize `items`, returning one result per item in order"""
+        if Config.SEARCH_BATCH_SUMMARIES:
+            return await self.search_agent.run_batch([(item.query, item.reason) for item in items])
+        results = await asyncio.gather(
+            *[self.search_agent.run(f"Search term: {item.query}\nReason for searching: {item.reason}") for item in items],
+            return_exceptions=True
+        )
+        return [
+            f"Search for '{item.query}' failed: {result}" if isinstance(result, Exception) else result
+            for item, result in zip(items, results)
+        ]
+    
     async def write_report(self, query: str, search_results: list[str]) -> ReportData:
         """Write the report for the query"""
         return await self.writer_agent.run(query, search_results)
     
-    async def send_email(self, report: str) -> dict:
+    async def send_email(self, report: ReportData) -> dict:
         """Send the report via email"""
-        return await self.email_agent.run(report)
\ No newline at end of file
+        with tracer.span("send_email") as span:
+            result = await self.email_agent.run(report)
+            span.set_attribute("status", result.get("status", "unknown"))
+            return result
+    
+    async def close(self):
+        """Let queued emails finish, then close the pooled HTTP connections"""
+        await self.background_tasks.shutdown()
+        await self.http_pool.close()
+
+_shared_manager = None
+_shared_manager_lock = threading.Lock()
+
+def get_research_manager() -> ResearchManager:
+    """Return the process-wide ResearchManager, building it (and its agents) only once"""
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = ResearchManager()
+        return _shared_manager
@@ -0,0 +1,48 @@
+"""Build and query the offline search index used by the `local` entry of SEARCH_BACKENDS.
+
+The index is built from a MediaWiki XML export (e.g. enwiki-latest-pages-articles.xml.bz2)
+or a JSONL file with one {"title": ..., "text": ...} object per line. `update` adds
+pages as new segments (replacing pages with the same title), and `merge` folds
+all segments back together once updates have piled up:
+
+    python search_index.py build enwiki-latest-pages-articles.xml.bz2
+    python search_index.py update new_pages.jsonl
+    python search_index.py merge
+    python search_index.py search "quantum error correction"
+"""
+import argparse
+import time
+from utils.local_index import LocalIndex, read_dump
+
+
+def main(args):
+    index = LocalIndex(args.index)
+    started = time.perf_counter()
+    if args.command == "build":
+        count = index.add(read_dump(args.source), args.segment_docs, replace=True)
+        print(f"Indexed {count} pages in {time.perf_counter() - started:.1f}s")
+    elif args.command == "update":
+        count = index.add(read_dump(args.source), args.segment_docs)
+        print(f"Added {count} pages in {time.perf_counter() - started:.1f}s")
+    elif args.command == "merge":
+        count = index.merge(args.segment_docs)
+        print(f"Merged {count} pages into {len(index.segments)} segment(s) in {time.perf_counter() - started:.1f}s")
+    else:
+        hits = index.search_sync(args.source, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        for hit in hits:
+            print(f"{hit['score']:7.2f}  {hit['title']}: {hit['snippet']}")
+        print(f"{len(hits)} result(s) from {index.document_count} pages in {elapsed:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build, update or query the offline search index")
+    parser.add_argument("command", choices=["build", "update", "merge", "search"])
+    parser.add_argument("source", nargs="?", help="Dump file to index, or the query to search for")
+    parser.add_argument("--index", help="Index directory (default LOCAL_INDEX_DIR)")
+    parser.add_argument("--segment-docs", type=int, help="Pages per segment (default LOCAL_INDEX_SEGMENT_DOCS)")
+    parser.add_argument("--limit", type=int, default=3, help="Results to show when searching")
+    args = parser.parse_args()
+    if args.command != "merge" and not args.source:
+        parser.error(f"{args.command} needs a dump file or query")
+    main(args)
@@ -0,0 +1,98 @@
+import asyncio
+from collections import Counter, deque
+from typing import AsyncIterator
+from utils.config import Config
+
+
+class AdmissionRejected(Exception):
+    """Raised when a run can't be queued; the message is meant to be shown to the user"""
+
+
+class Ticket:
+    """One run's place in line; `admitted` is set once it may start"""
+
+    def __init__(self, user: str):
+        self.user = user
+        self.admitted = asyncio.Event()
+        self.released = False
+
+
+class AdmissionController:
+    """Caps concurrent research runs, queueing the rest in FIFO order.
+
+    At most `max_running` runs execute at once and at most `max_queued` wait behind
+    them; beyond that new runs are shed. Each user may hold `max_per_user` tickets
+    (queued or running), so one client can't fill the queue for everyone else.
+    """
+
+    POSITION_POLL_SECONDS = 1.0
+
+    def __init__(self, max_running: int = None, max_queued: int = None, max_per_user: int = None):
+        self.max_running = max_running or Config.MAX_CONCURRENT_RUNS
+        self.max_queued = Config.MAX_QUEUED_RUNS if max_queued is None else max_queued
+        self.max_per_user = max_per_user or Config.MAX_RUNS_PER_USER
+        self._waiting = deque()
+        self._running = 0
+        self._per_user = Counter()
+        self.admitted = 0
+        self.rejected = 0
+
+    def enqueue(self, user: str) -> Ticket:
+        """Take a place in line, or raise AdmissionRejected if the user or the queue is at its limit"""
+        if self._per_user[user] >= self.max_per_user:
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"You already have {self._per_user[user]} research run(s) in progress; "
+                "please wait for them to finish"
+            )
+        if self._running >= self.max_running and len(self._waiting) >= self.max_queued:
+            self.rejected += 1
+            raise AdmissionRejected("Server busy: too many research runs are queued, please try again in a few minutes")
+
+        ticket = Ticket(user)
+        self._per_user[user] += 1
+        self._waiting.append(ticket)
+        self._dispatch()
+        return ticket
+
+    async def wait(self, ticket: Ticket) -> AsyncIterator[int]:
+        """Yield the ticket's 1-based queue position whenever it changes, until it is admitted"""
+        position = None
+        while not ticket.admitted.is_set():
+            current = self._waiting.index(ticket) + 1
+            if current != position:
+                position = current
+                yield position
+            try:
+                await asyncio.wait_for(ticket.admitted.wait(), timeout=self.POSITION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, ticket: Ticket):
+        """Give up the ticket's slot or queue place, whether or not the run started; later calls do nothing"""
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.admitted.is_set():
+            self._running -= 1
+        else:
+            self._waiting.remove(ticket)
+        self._per_user[ticket.user] -= 1
+        if not self._per_user[ticket.user]:
+            del self._per_user[ticket.user]
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiting and self._running < self.max_running:
+            ticket = self._waiting.popleft()
+            self._running += 1
+            self.admitted += 1
+            ticket.admitted.set()
+
+    def get_stats(self) -> dict:
+        return {
+            "running": self._running,
+            "queued": len(self._waiting),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
@@ -1,45 +1,285 @@
-import time
 import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import Counter, deque
 from datetime import datetime
+from typing import Callable, Optional
+from utils.config import Config
+
+class LatencyHistogram:
+    """Fixed log-spaced buckets, so percentiles come from counts instead of stored samples"""
+
+    MIN_VALUE = 0.001  # 1ms
+    GROWTH = 1.2       # each bucket is 20% wider than the last (worst-case error ~10%)
+    BUCKETS = 80       # covers up to ~30 minutes (0.001 * 1.2**79 s); longer values share the last bucket
 
-class Analytics:
     def __init__(self):
-        self.research_sessions = []
-    
-    def start_session(self, query: str):
-        session = {
-            'id': f"session_{int(time.time())}",
-            'query': query,
-            'start_time': datetime.now().isoformat(),
-            'status': 'running',
-            'steps_completed': []
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value: float):
+        if value <= self.MIN_VALUE:
+            index = 0
+        else:
+            index = min(self.BUCKETS - 1, int(math.log(value / self.MIN_VALUE, self.GROWTH)) + 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = pct / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if bucket_count and seen >= rank:
+                upper = self.MIN_VALUE * self.GROWTH ** index
+                lower = upper / self.GROWTH if index else 0.0
+                return min(max((lower + upper) / 2, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {"counts": self.counts, "count": self.count, "total": self.total, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = list(data["counts"])
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max
         }
-        self.research_sessions.append(session)
-        return session['id']
-    
-    def log_step(self, session_id: str, step_name: str, status: str = 'completed'):
-        for session in self.research_sessions:
-            if session['id'] == session_id:
-                session['steps_completed'].append({
-                    'step': step_name,
-                    'status': status,
-                    'timestamp': datetime.now().isoformat()
-                })
+
+class SlidingWindowCounter:
+    """Event timestamps over the last `max_window` seconds, for rates over shorter windows"""
+
+    def __init__(self, max_window: float):
+        self.max_window = max_window
+        self._events = deque()
+
+    def record(self, timestamp: float = None):
+        self._events.append(timestamp if timestamp is not None else time.time())
+        self._trim()
+
+    def _trim(self):
+        cutoff = time.time() - self.max_window
+        while self._events and self._events[0] < cutoff:
+            self._events.popleft()
+
+    def timestamps(self) -> list:
+        self._trim()
+        return list(self._events)
+
+    def count(self, window: float) -> int:
+        self._trim()
+        cutoff = time.time() - window
+        # Events are in time order, so count back from the newest
+        total = 0
+        for timestamp in reversed(self._events):
+            if timestamp < cutoff:
                 break
-    
+            total += 1
+        return total
+
+class Analytics:
+    """Research session tracking with bounded memory and an append-only on-disk log.
+
+    Sessions are indexed by id and the oldest are dropped beyond `max_sessions`.
+    Totals, per-step duration histograms and throughput windows are updated as
+    events arrive, and rebuilt on startup by replaying the log. Whenever the log
+    grows past `compact_after` events it is rewritten as a single snapshot.
+    """
+
+    THROUGHPUT_WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+
+    def __init__(self, max_sessions: int = None, log_path: str = None, compact_after: int = None):
+        self.max_sessions = max_sessions or Config.ANALYTICS_MAX_SESSIONS
+        self.log_path = Config.ANALYTICS_LOG_PATH if log_path is None else log_path
+        self.compact_after = compact_after or self.max_sessions * 20
+        self.sessions = {}
+        self._session_order = deque()
+        self._lock = threading.Lock()
+        self._cache_sources = {}
+        self._logged_events = 0
+
+        self.total_sessions = 0
+        self.status_counts = Counter()
+        self.step_durations = {}
+        self.step_metrics = Counter()
+        self.session_durations = LatencyHistogram()
+        self.completions = SlidingWindowCounter(max(self.THROUGHPUT_WINDOWS.values()))
+
+        if self.log_path:
+            self._replay()
+
+    def start_session(self, query: str):
+        event = {"event": "start", "id": f"session_{uuid.uuid4().hex}", "query": query, "time": time.time()}
+        self._record(event)
+        return event["id"]
+
+    def log_step(self, session_id: str, step_name: str, status: str = 'completed', duration: float = None,
+                 metrics: dict = None):
+        """Record a finished step; numeric `metrics` are also summed per step across sessions"""
+        self._record({
+            "event": "step", "id": session_id, "step": step_name, "status": status,
+            "duration": duration, "metrics": metrics or {}, "time": time.time()
+        })
+
     def complete_session(self, session_id: str, status: str = 'completed'):
-        for session in self.research_sessions:
-            if session['id'] == session_id:
-                session['end_time'] = datetime.now().isoformat()
-                session['status'] = status
-                break
-    
+        self._record({"event": "complete", "id": session_id, "status": status, "time": time.time()})
+
+    def register_cache(self, name: str, stats_fn: Callable[[], dict]):
+        """Include a cache's hit/miss counters (from its get_stats) in get_stats"""
+        self._cache_sources[name] = stats_fn
+
+    def _record(self, event: dict):
+        with self._lock:
+            self._apply(event)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event) + "\n")
+                self._logged_events += 1
+                if self._logged_events > self.compact_after:
+                    self._compact()
+
+    def _apply(self, event: dict):
+        if event["event"] == "snapshot":
+            self._restore(event)
+            return
+
+        timestamp = datetime.fromtimestamp(event["time"]).isoformat()
+        if event["event"] == "start":
+            self.sessions[event["id"]] = {
+                'id': event["id"],
+                'query': event["query"],
+                'start_time': timestamp,
+                'started_at': event["time"],
+                'status': 'running',
+                'steps_completed': []
+            }
+            self._session_order.append(event["id"])
+            while len(self._session_order) > self.max_sessions:
+                self.sessions.pop(self._session_order.popleft(), None)
+            self.total_sessions += 1
+            self.status_counts['running'] += 1
+            return
+
+        session = self.sessions.get(event["id"])
+        if event["event"] == "step":
+            if event.get("duration") is not None:
+                self.step_durations.setdefault(event["step"], LatencyHistogram()).record(event["duration"])
+            for name, value in event.get("metrics", {}).items():
+                self.step_metrics[f"{event['step']}.{name}"] += value
+            if session is not None:
+                session['steps_completed'].append({
+                    'step': event["step"],
+                    'status': event["status"],
+                    'duration': event.get("duration"),
+                    'metrics': event.get("metrics", {}),
+                    'timestamp': timestamp
+                })
+        elif event["event"] == "complete":
+            if session is not None:
+                if session['status'] != 'running':
+                    return
+                session['end_time'] = timestamp
+                session['status'] = event["status"]
+                self.session_durations.record(event["time"] - session['started_at'])
+            self.status_counts['running'] = max(0, self.status_counts['running'] - 1)
+            self.status_counts[event["status"]] += 1
+            self.completions.record(event["time"])
+
+    def _replay(self):
+        """Rebuild state from the on-disk log, skipping any truncated trailing line"""
+        if os.path.dirname(self.log_path):
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        if not os.path.exists(self.log_path):
+            return
+        events = 0
+        with open(self.log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line))
+                    events += 1
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        # Sessions still 'running' in the log were interrupted by the restart
+        self.status_counts['running'] = 0
+        for session in self.sessions.values():
+            if session['status'] == 'running':
+                session['status'] = 'interrupted'
+        self._logged_events = events
+        if events > self.compact_after:
+            self._compact()
+
+    def _compact(self):
+        """Replace the log with one snapshot event holding the aggregates and retained sessions"""
+        snapshot = {
+            "event": "snapshot",
+            "time": time.time(),
+            "total_sessions": self.total_sessions,
+            "status_counts": dict(self.status_counts),
+            "step_durations": {step: histogram.to_dict() for step, histogram in self.step_durations.items()},
+            "step_metrics": dict(self.step_metrics),
+            "session_durations": self.session_durations.to_dict(),
+            "completions": self.completions.timestamps(),
+            "sessions": [self.sessions[session_id] for session_id in self._session_order]
+        }
+        temp_path = f"{self.log_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(snapshot) + "\n")
+        os.replace(temp_path, self.log_path)
+        self._logged_events = 1
+
+    def _restore(self, snapshot: dict):
+        self.total_sessions = snapshot["total_sessions"]
+        self.status_counts = Counter(snapshot["status_counts"])
+        self.step_durations = {
+            step: LatencyHistogram.from_dict(data) for step, data in snapshot["step_durations"].items()
+        }
+        self.step_metrics = Counter(snapshot.get("step_metrics", {}))
+        self.session_durations = LatencyHistogram.from_dict(snapshot["session_durations"])
+        for timestamp in snapshot["completions"]:
+            self.completions.record(timestamp)
+        self.sessions = {session['id']: session for session in snapshot["sessions"]}
+        self._session_order = deque(session['id'] for session in snapshot["sessions"])
+
     def get_stats(self):
-        completed = sum(1 for s in self.research_sessions if s['status'] == 'completed')
-        failed = sum(1 for s in self.research_sessions if s['status'] == 'failed')
-        return {
-            'total_sessions': len(self.research_sessions),
-            'completed': completed,
-            'failed': failed,
-            'success_rate': completed / len(self.research_sessions) * 100 if self.research_sessions else 0
-        }
\ No newline at end of file
+        with self._lock:
+            completed = self.status_counts['completed']
+            stats = {
+                'total_sessions': self.total_sessions,
+                'completed': completed,
+                'failed': self.status_counts['failed'],
+                'running': self.status_counts['running'],
+                'success_rate': completed / self.total_sessions * 100 if self.total_sessions else 0,
+                'session_duration': self.session_durations.summary(),
+                'step_durations': {step: histogram.summary() for step, histogram in self.step_durations.items()},
+                'step_metrics': dict(self.step_metrics),
+                'throughput_per_minute': {
+                    name: self.completions.count(window) / (window / 60)
+                    for name, window in self.THROUGHPUT_WINDOWS.items()
+                }
+            }
+        stats['cache_hit_rates'] = {name: stats_fn().get('hit_rate', 0) for name, stats_fn in self._cache_sources.items()}
+        return stats
@@ -0,0 +1,86 @@
+import asyncio
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+
+class BackgroundTaskPool:
+    """Runs tracked background coroutines with bounded concurrency and a bounded backlog.
+
+    At most `max_concurrency` tasks run at once; once `max_pending` tasks are queued
+    or running, `submit` refuses new work instead of letting it pile up. The status of
+    the most recent tasks is kept for later lookup.
+    """
+
+    def __init__(self, max_concurrency: int, max_pending: int, history_size: int = 1000):
+        self.max_pending = max_pending
+        self.history_size = history_size
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks = {}
+        self._statuses = OrderedDict()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def submit(self, name: str, fn: Callable[[], Awaitable[Any]]) -> Optional[str]:
+        """Schedule `fn()` in the background; returns a task id, or None if the backlog is full"""
+        if len(self._tasks) >= self.max_pending:
+            self.rejected += 1
+            return None
+
+        task_id = f"{name}_{uuid.uuid4().hex[:12]}"
+        self._set_status(task_id, {"name": name, "status": "queued"})
+        self._tasks[task_id] = asyncio.create_task(self._run(task_id, name, fn))
+        self.submitted += 1
+        return task_id
+
+    async def _run(self, task_id: str, name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            async with self._slots:
+                self._set_status(task_id, {"name": name, "status": "running"})
+                result = await fn()
+            self._set_status(task_id, {"name": name, "status": "completed", "result": result})
+            self.completed += 1
+            return result
+        except Exception as e:
+            print(f"Background task {task_id} failed: {e}")
+            self._set_status(task_id, {"name": name, "status": "failed", "error": str(e)})
+            self.failed += 1
+            return None
+        finally:
+            self._tasks.pop(task_id, None)
+
+    def _set_status(self, task_id: str, status: dict):
+        self._statuses[task_id] = status
+        self._statuses.move_to_end(task_id)
+        while len(self._statuses) > self.history_size:
+            self._statuses.popitem(last=False)
+
+    def get_status(self, task_id: str) -> Optional[dict]:
+        return self._statuses.get(task_id)
+
+    async def wait(self, task_id: str) -> Optional[dict]:
+        """Wait for a task to finish and return its status; cancelling the waiter doesn't cancel the task"""
+        task = self._tasks.get(task_id)
+        if task is not None:
+            await asyncio.shield(task)
+        return self.get_status(task_id)
+
+    async def shutdown(self, timeout: float = 30):
+        """Give in-flight tasks up to `timeout` seconds to finish, then cancel the rest"""
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    def get_stats(self) -> dict:
+        return {
+            "pending": len(self._tasks),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,10 +12,101 @@ class Config:
     # Email Configuration
     FROM_EMAIL = os.getenv("FROM_EMAIL")
     TO_EMAIL = os.getenv("TO_EMAIL")
+    EMAIL_MAX_CONCURRENCY = int(os.getenv("EMAIL_MAX_CONCURRENCY", "2"))
+    EMAIL_MAX_PENDING = int(os.getenv("EMAIL_MAX_PENDING", "50"))
+    EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+    EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "1.0"))
+    EMAIL_USE_LLM = os.getenv("EMAIL_USE_LLM", "false").lower() == "true"
     
     # Model Selection
     GEMINI_MODEL = os.getenv("GEMINI_MODEL")
     
+    # Gemini Rate Limits (shared by every request in the process)
+    GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "15"))
+    GEMINI_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+    GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "5"))
+    
+    # LLM Response Cache (agents not listed in LLM_CACHE_AGENTS always call the API)
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite3")
+    LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    LLM_CACHE_AGENTS = [name.strip() for name in os.getenv("LLM_CACHE_AGENTS", "planner,search,writer,email").split(",") if name.strip()]
+    
+    # Outbound HTTP (shared connection pool used by the search agent)
+    HTTP_USER_AGENT = os.getenv("HTTP_USER_AGENT", "ResearchAssistant/1.0 (research@example.com)")
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+    HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    
+    # Wikipedia
+    WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+    
+    # Search Backends (wikipedia, duckduckgo or local, queried concurrently; the hedge backend is
+    # only called when one of them is slower than its usual SEARCH_HEDGE_PERCENTILE latency)
+    SEARCH_BACKENDS = [name.strip() for name in os.getenv("SEARCH_BACKENDS", "wikipedia,duckduckgo").lower().split(",") if name.strip()]
+    SEARCH_BACKEND_TIMEOUT = float(os.getenv("SEARCH_BACKEND_TIMEOUT", "8"))
+    SEARCH_HEDGE_BACKEND = os.getenv("SEARCH_HEDGE_BACKEND", "").strip().lower()
+    SEARCH_HEDGE_PERCENTILE = float(os.getenv("SEARCH_HEDGE_PERCENTILE", "90"))
+    SEARCH_HEDGE_MIN_SAMPLES = int(os.getenv("SEARCH_HEDGE_MIN_SAMPLES", "20"))
+    SEARCH_MAX_HITS = int(os.getenv("SEARCH_MAX_HITS", "5"))
+    DUCKDUCKGO_API_URL = os.getenv("DUCKDUCKGO_API_URL", "https://api.duckduckgo.com/")
+    LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", ".cache/search_index")
+    LOCAL_INDEX_SEGMENT_DOCS = int(os.getenv("LOCAL_INDEX_SEGMENT_DOCS", "50000"))
+    
+    # Passage Retrieval (the article passages that best match a search are passed to the summarizer)
+    SEARCH_PASSAGE_CHARS = int(os.getenv("SEARCH_PASSAGE_CHARS", "600"))
+    SEARCH_PASSAGES_TOP_K = int(os.getenv("SEARCH_PASSAGES_TOP_K", "4"))
+    SEARCH_PASSAGE_BUDGET = int(os.getenv("SEARCH_PASSAGE_BUDGET", "2000"))
+    
+    # Search Result Cache (SEARCH_CACHE_PATH enables the on-disk tier)
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "21600"))
+    SEARCH_CACHE_NEGATIVE_TTL = int(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "120"))
+    SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "")
+    
+    # Structured Output (follow-up calls allowed when a JSON response doesn't match its schema)
+    STRUCTURED_OUTPUT_MAX_REPAIRS = int(os.getenv("STRUCTURED_OUTPUT_MAX_REPAIRS", "1"))
+    
+    # Search Planning (planned queries at least this similar to an earlier one are dropped)
+    PLANNER_SPARE_SEARCHES = int(os.getenv("PLANNER_SPARE_SEARCHES", "2"))
+    SEARCH_DEDUP_THRESHOLD = float(os.getenv("SEARCH_DEDUP_THRESHOLD", "0.7"))
+    
+    # Adaptive Fan-out (plan size follows query complexity; searches stop early once enough are done)
+    SEARCH_ADAPTIVE = os.getenv("SEARCH_ADAPTIVE", "false").lower() == "true"
+    SEARCH_MIN_SEARCHES = int(os.getenv("SEARCH_MIN_SEARCHES", "3"))
+    SEARCH_MAX_SEARCHES = int(os.getenv("SEARCH_MAX_SEARCHES", "8"))
+    SEARCH_LATENCY_BUDGET = float(os.getenv("SEARCH_LATENCY_BUDGET", "20"))
+    SEARCH_SECONDS_PER_SEARCH = float(os.getenv("SEARCH_SECONDS_PER_SEARCH", "2.5"))
+    SEARCH_COVERAGE = float(os.getenv("SEARCH_COVERAGE", "0.8"))
+    
+    # Summarize all of a plan's searches with one LLM call instead of one call per search
+    SEARCH_BATCH_SUMMARIES = os.getenv("SEARCH_BATCH_SUMMARIES", "true").lower() == "true"
+    
+    # Report Writing
+    WRITER_STREAMING = os.getenv("WRITER_STREAMING", "true").lower() == "true"
+    # Estimated tokens of research findings passed to the writer (0 disables trimming)
+    WRITER_INPUT_TOKEN_BUDGET = int(os.getenv("WRITER_INPUT_TOKEN_BUDGET", "6000"))
+    
+    # Admission Control (research runs started from the web UI)
+    MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", "4"))
+    MAX_QUEUED_RUNS = int(os.getenv("MAX_QUEUED_RUNS", "20"))
+    MAX_RUNS_PER_USER = int(os.getenv("MAX_RUNS_PER_USER", "1"))
+    
+    # Report Export (files are deduplicated by content and cleaned up by age and count)
+    EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "research_exports"))
+    EXPORT_MAX_FILES = int(os.getenv("EXPORT_MAX_FILES", "200"))
+    EXPORT_MAX_AGE = float(os.getenv("EXPORT_MAX_AGE", "86400"))
+    
+    # Analytics (set ANALYTICS_LOG_PATH to an empty string to keep analytics in memory only)
+    ANALYTICS_MAX_SESSIONS = int(os.getenv("ANALYTICS_MAX_SESSIONS", "1000"))
+    ANALYTICS_LOG_PATH = os.getenv("ANALYTICS_LOG_PATH", ".cache/analytics.jsonl")
+    
+    # Tracing (spans are always kept in memory; TRACE_JSONL_PATH also appends them to a file)
+    TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "")
+    
     @classmethod
     def validate(cls):
         if not cls.GOOGLE_API_KEY:
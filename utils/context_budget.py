@@ -0,0 +1,94 @@
+import re
+from utils.config import Config
+from utils.rate_limiter import estimate_tokens
+
+# Findings that carry no research content: failed searches and GeminiProvider's fallback text
+UNUSABLE_FINDING = re.compile(
+    r"^\s*(?:Search \d+ failed:|Search for '.*' failed:"
+    r"|I apologize, but I'm experiencing technical difficulties"
+    r"|Based on research about .*, here is a summary of key findings\.\.\.\s*$)",
+    re.DOTALL
+)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[*])")
+
+# Sentences sharing this fraction of their words with an earlier one are redundant
+REDUNDANT_SIMILARITY = 0.8
+# Shorter sentences (headings, list labels) are never treated as redundant
+MIN_DEDUP_WORDS = 5
+
+
+class ContextBudgeter:
+    """Shrinks research findings to fit a token budget without losing unique content.
+
+    Unusable findings are dropped, sentences repeating an earlier finding are removed,
+    and if the rest is still over budget each finding is cut back at sentence
+    boundaries to a fair share of it.
+    """
+
+    def __init__(self, max_tokens: int = None):
+        self.max_tokens = Config.WRITER_INPUT_TOKEN_BUDGET if max_tokens is None else max_tokens
+
+    def fit(self, findings: list[str]) -> tuple[list[str], dict]:
+        """Return the findings to give the writer, and stats on what was removed"""
+        usable = [finding.strip() for finding in findings if finding and finding.strip() and not UNUSABLE_FINDING.match(finding)]
+        deduplicated, sentences_removed = self._remove_redundant_sentences(usable)
+        deduplicated = [finding for finding in deduplicated if finding]
+        trimmed = self._trim(deduplicated) if self.max_tokens else deduplicated
+
+        stats = {
+            "findings_in": len(findings),
+            "findings_dropped": len(findings) - len(trimmed),
+            "sentences_removed": sentences_removed,
+            "tokens_before": sum(estimate_tokens(finding or "") for finding in findings),
+            "tokens_after": sum(estimate_tokens(finding) for finding in trimmed),
+        }
+        return trimmed, stats
+
+    def _remove_redundant_sentences(self, findings: list[str]) -> tuple[list[str], int]:
+        seen = []
+        removed = 0
+        result = []
+        for finding in findings:
+            lines = []
+            for line in finding.split("\n"):
+                kept = []
+                for sentence in SENTENCE_END.split(line):
+                    words = set(re.findall(r"\w+", sentence.casefold()))
+                    if len(words) >= MIN_DEDUP_WORDS:
+                        if any(len(words & other) / len(words | other) >= REDUNDANT_SIMILARITY for other in seen):
+                            removed += 1
+                            continue
+                        seen.append(words)
+                    kept.append(sentence)
+                if kept or not line.strip():
+                    lines.append(" ".join(kept))
+            result.append(re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip())
+        return result, removed
+
+    def _trim(self, findings: list[str]) -> list[str]:
+        """Cut findings to fit max_tokens; short findings give their unused share to longer ones"""
+        sizes = [estimate_tokens(finding) for finding in findings]
+        if sum(sizes) <= self.max_tokens:
+            return findings
+
+        # Water-filling: raise a common cap until the budget is spent
+        remaining = self.max_tokens
+        caps = [0] * len(findings)
+        order = sorted(range(len(findings)), key=sizes.__getitem__)
+        for position, i in enumerate(order):
+            share = remaining // (len(order) - position)
+            caps[i] = min(sizes[i], share)
+            remaining -= caps[i]
+        return [self._cut(finding, cap) for finding, cap in zip(findings, caps) if cap > 0]
+
+    @staticmethod
+    def _cut(finding: str, max_tokens: int) -> str:
+        if estimate_tokens(finding) <= max_tokens:
+            return finding
+        end = 0
+        for match in SENTENCE_END.finditer(finding):
+            if estimate_tokens(finding[:match.start()]) > max_tokens:
+                break
+            end = match.start()
+        # A first sentence longer than the cap is cut mid-sentence rather than dropped
+        return finding[:end] if end else finding[:max_tokens * 4]
@@ -0,0 +1,79 @@
+import asyncio
+import random
+from typing import Dict, Optional
+import sendgrid
+from python_http_client.exceptions import HTTPError
+from sendgrid.helpers.mail import Content, Email, Mail, To
+from utils.config import Config
+
+
+class EmailSender:
+    """Sends mail through SendGrid without blocking the event loop.
+
+    The API client is created once and reused. Each send is one API call however
+    many recipients there are (each gets their own copy), runs in a worker thread,
+    and is retried with exponential backoff on rate limiting, server errors and
+    network failures.
+    """
+
+    def __init__(self, api_key: str = None, max_retries: int = None, backoff: float = None):
+        self.api_key = api_key or Config.SENDGRID_API_KEY
+        self.max_retries = Config.EMAIL_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = Config.EMAIL_RETRY_BACKOFF if backoff is None else backoff
+        self._client = None
+
+    @property
+    def client(self) -> sendgrid.SendGridAPIClient:
+        if self._client is None:
+            self._client = sendgrid.SendGridAPIClient(api_key=self.api_key)
+        return self._client
+
+    @staticmethod
+    def recipients(addresses: Optional[str] = None) -> list[str]:
+        """Split a comma-separated address list (TO_EMAIL by default)"""
+        addresses = Config.TO_EMAIL if addresses is None else addresses
+        return [address.strip() for address in (addresses or "").split(",") if address.strip()]
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        if isinstance(error, HTTPError):
+            return error.status_code == 429 or error.status_code >= 500
+        return True
+
+    async def send(self, subject: str, html_body: str, recipients: list[str] = None) -> Dict[str, str]:
+        recipients = recipients or self.recipients()
+        if not recipients:
+            return {"status": "error", "message": "No recipients configured (set TO_EMAIL)"}
+        mail = Mail(
+            from_email=Email(Config.FROM_EMAIL),
+            to_emails=[To(address) for address in recipients],
+            subject=subject,
+            html_content=Content("text/html", html_body),
+            is_multiple=len(recipients) > 1
+        )
+        request_body = mail.get()
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await asyncio.to_thread(self.client.client.mail.send.post, request_body=request_body)
+                print(f"Email response: {response.status_code}")
+                return {
+                    "status": "success",
+                    "message": f"Email sent to {len(recipients)} recipient(s) (Status: {response.status_code})"
+                }
+            except Exception as e:
+                if attempt == self.max_retries or not self._retryable(e):
+                    return {"status": "error", "message": f"Failed to send email: {str(e)}"}
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                print(f"Email send failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+_shared_sender = None
+
+def get_email_sender() -> EmailSender:
+    """Return the process-wide EmailSender so the SendGrid client is reused"""
+    global _shared_sender
+    if _shared_sender is None:
+        _shared_sender = EmailSender()
+    return _shared_sender
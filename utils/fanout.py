@@ -0,0 +1,53 @@
+import asyncio
+import math
+import re
+from typing import AsyncIterator, Awaitable
+from utils.config import Config
+
+# Words and punctuation that usually join separate facets of a question
+FACET_MARKERS = re.compile(r",|;|\?|\b(?:and|or|vs|versus|compared?|between|impact|effects?)\b", re.IGNORECASE)
+
+
+def query_complexity(query: str) -> float:
+    """Rough 0-1 score from the query's length and how many facets it joins"""
+    words = len(re.findall(r"\w+", query))
+    facets = len(FACET_MARKERS.findall(query))
+    return 0.5 * min(words, 20) / 20 + 0.5 * min(facets, 4) / 4
+
+
+def adaptive_plan_size(query: str, budget: float = None) -> int:
+    """How many searches to plan: more for complex queries, fewer when the latency budget is tight"""
+    budget = Config.SEARCH_LATENCY_BUDGET if budget is None else budget
+    low, high = Config.SEARCH_MIN_SEARCHES, Config.SEARCH_MAX_SEARCHES
+    size = low + round((high - low) * query_complexity(query))
+    affordable = int(budget / Config.SEARCH_SECONDS_PER_SEARCH)
+    return max(low, min(size, affordable))
+
+
+async def as_completed_until(aws: list[Awaitable], coverage: float, timeout: float) -> AsyncIterator[tuple]:
+    """Yield (index, result or exception) as `aws` finish, stopping early.
+
+    Stops once `coverage` of them have succeeded or `timeout` seconds have passed,
+    and cancels whatever is still running, so stragglers don't hold up the caller.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    index_of = {task: i for i, task in enumerate(tasks)}
+    needed = math.ceil(coverage * len(tasks))
+    deadline = asyncio.get_running_loop().time() + timeout
+    pending = set(tasks)
+    succeeded = 0
+    try:
+        while pending and succeeded < needed:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=index_of.get):
+                if task.exception() is None:
+                    succeeded += 1
+                    yield index_of[task], task.result()
+                else:
+                    yield index_of[task], task.exception()
+    finally:
+        for task in pending:
+            task.cancel()
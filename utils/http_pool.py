@@ -0,0 +1,100 @@
+import asyncio
+import atexit
+import aiohttp
+from utils.config import Config
+
+
+class HttpPool:
+    """A long-lived aiohttp session with keep-alive connections and DNS caching.
+
+    The session is created lazily inside the running event loop and recreated if
+    it was closed or the loop changed. Connection create/reuse counts are collected
+    through aiohttp's tracing hooks.
+    """
+
+    def __init__(self, limit: int = None, limit_per_host: int = None, keepalive_timeout: float = None,
+                 dns_cache_ttl: int = None, total_timeout: float = None, connect_timeout: float = None):
+        self.limit = limit or Config.HTTP_MAX_CONNECTIONS
+        self.limit_per_host = limit_per_host or Config.HTTP_MAX_CONNECTIONS_PER_HOST
+        self.keepalive_timeout = keepalive_timeout or Config.HTTP_KEEPALIVE_TIMEOUT
+        self.dns_cache_ttl = dns_cache_ttl or Config.HTTP_DNS_CACHE_TTL
+        self.total_timeout = total_timeout or Config.HTTP_TIMEOUT
+        self.connect_timeout = connect_timeout or Config.HTTP_CONNECT_TIMEOUT
+
+        self._session = None
+        self._loop = None
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        async def on_request_start(session, context, params):
+            self.requests += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections_reused += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.total_timeout, connect=self.connect_timeout),
+                headers={"User-Agent": Config.HTTP_USER_AGENT},
+                trace_configs=[self._trace_config()]
+            )
+            self._loop = loop
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def close_sync(self):
+        """Best-effort close at interpreter shutdown, from outside the session's event loop"""
+        session, loop = self._session, self._loop
+        if session is None or session.closed or loop is None or loop.is_closed():
+            return
+        try:
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout=5)
+            else:
+                loop.run_until_complete(session.close())
+        except Exception as e:
+            print(f"Error closing HTTP session: {e}")
+
+    def get_stats(self) -> dict:
+        connections = self.connections_created + self.connections_reused
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_rate": self.connections_reused / connections * 100 if connections else 0
+        }
+
+
+_shared_pool = None
+
+def get_http_pool() -> HttpPool:
+    """Return the process-wide HttpPool, closing it automatically at exit"""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = HttpPool()
+        atexit.register(_shared_pool.close_sync)
+    return _shared_pool
@@ -0,0 +1,468 @@
+import asyncio
+import bz2
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import threading
+import xml.etree.ElementTree as ET
+from typing import Iterable, Iterator
+import numpy as np
+from utils.config import Config
+from utils.passage_retrieval import tokenize
+
+# One row per document: where its UTF-8 title and text start in text.bin, their sizes,
+# and its length in tokens for BM25 length normalization
+DOC_DTYPE = np.dtype([("offset", "<i8"), ("title_bytes", "<i4"), ("text_bytes", "<i4"), ("length", "<i4")])
+# Postings are grouped by term; each term's range is looked up in the term table
+POSTING_DTYPE = np.dtype([("doc", "<i4"), ("tf", "<i4")])
+TERM_DTYPE = np.dtype([("start", "<i8"), ("count", "<i4")])
+# Where "source\ntarget" of each redirect is stored in redirects.bin
+REDIRECT_DTYPE = np.dtype([("offset", "<i8"), ("bytes", "<i4")])
+# Title tokens count this many times, so a page about the search term outranks pages that mention it
+TITLE_WEIGHT = 3
+
+
+def key_hash(key: str) -> int:
+    """64-bit hash that terms and titles are looked up by; collisions are vanishingly rare at Wikipedia scale"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def normalize_title(title: str) -> str:
+    return re.sub(r"[\s_]+", " ", title.casefold()).strip()
+
+
+def strip_wikitext(text: str) -> str:
+    """Reduce MediaWiki markup to plain text, keeping headings as their own lines"""
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.DOTALL)
+    text = re.sub(r"<ref[^>]*/>|<ref[^>]*>.*?</ref>", "", text, flags=re.DOTALL | re.IGNORECASE)
+    text = re.sub(r"^\{\|.*?^\|\}", "", text, flags=re.DOTALL | re.MULTILINE)
+    # Templates nest, so remove the innermost ones until none are left
+    for _ in range(10):
+        text, removed = re.subn(r"\{\{[^{}]*\}\}", "", text)
+        if not removed:
+            break
+    text = re.sub(r"\[\[(?:File|Image|Category):(?:[^\[\]]|\[\[[^\]]*\]\])*\]\]", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]", r"\1", text)
+    text = re.sub(r"\[https?://\S+\s*([^\]]*)\]", r"\1", text)
+    text = re.sub(r"'{2,}", "", text)
+    text = re.sub(r"<[^>]+>", "", text)
+    text = html.unescape(text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def read_dump(path: str) -> Iterator[dict]:
+    """Pages from a MediaWiki XML export or a JSONL file, optionally .bz2/.gz compressed.
+
+    Yields {"title", "text"} for articles and {"title", "redirect"} for redirects.
+    JSONL lines need "title" and "text" (already plain text) and may have "redirect".
+    """
+    opener = bz2.open if path.endswith(".bz2") else gzip.open if path.endswith(".gz") else open
+    if ".xml" in os.path.basename(path):
+        with opener(path, "rb") as f:
+            yield from _read_xml(f)
+        return
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                page = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_number} of {path}: {e}")
+                continue
+            if page.get("title") and (page.get("text") or page.get("redirect")):
+                yield page
+
+
+def _read_xml(f) -> Iterator[dict]:
+    root = None
+    for event, element in ET.iterparse(f, events=("start", "end")):
+        if root is None:
+            root = element
+        if event != "end" or element.tag.rsplit("}", 1)[-1] != "page":
+            continue
+        fields = {child.tag.rsplit("}", 1)[-1]: child for child in element}
+        revision = fields.get("revision")
+        text = None
+        if revision is not None:
+            text = next((child.text for child in revision if child.tag.rsplit("}", 1)[-1] == "text"), None)
+        title = fields["title"].text if "title" in fields else None
+        # Only main-namespace articles are indexed
+        if title and (fields["ns"].text if "ns" in fields else "0") == "0":
+            if "redirect" in fields:
+                yield {"title": title, "redirect": fields["redirect"].get("title", "")}
+            elif text:
+                yield {"title": title, "text": strip_wikitext(text)}
+        # Detach finished pages from <mediawiki>, or the whole dump stays in memory
+        root.clear()
+
+
+class Segment:
+    """One immutable part of the index, written by a single build or update.
+
+    Every table is a NumPy array memory-mapped from disk. Terms, titles and
+    redirects are found by binary search over sorted arrays of their key_hash, so
+    opening a segment reads almost nothing and a lookup touches only a few pages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode="r")
+        self.docs = load("docs.npy")
+        self.postings = load("postings.npy")
+        self.term_keys, self.terms = load("term_keys.npy"), load("terms.npy")
+        self.title_keys, self.title_docs = load("title_keys.npy"), load("title_docs.npy")
+        self.redirect_keys, self.redirects = load("redirect_keys.npy"), load("redirects.npy")
+        self.text = self._map_bytes(os.path.join(path, "text.bin"))
+        self.redirect_text = self._map_bytes(os.path.join(path, "redirects.bin"))
+        # Only the last copy of a title within the segment is live, until a newer segment replaces it
+        self.live = np.zeros(len(self.docs), dtype=bool)
+        self.live[self.title_docs] = True
+
+    @staticmethod
+    def _map_bytes(path: str) -> np.ndarray:
+        return np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, np.uint8)
+
+    @staticmethod
+    def _find(keys: np.ndarray, key: int) -> int:
+        """Row of `key` in a sorted key array, or -1"""
+        row = int(np.searchsorted(keys, np.uint64(key)))
+        return row if row < len(keys) and int(keys[row]) == key else -1
+
+    def term(self, term: str) -> tuple:
+        """(start, count) of the term's postings, or None if it doesn't occur in this segment"""
+        row = self._find(self.term_keys, key_hash(term))
+        return None if row < 0 else (int(self.terms[row]["start"]), int(self.terms[row]["count"]))
+
+    def find_title(self, key: str) -> int:
+        """Document with the normalized title `key`, or -1"""
+        row = self._find(self.title_keys, key_hash(key))
+        if row < 0:
+            return -1
+        doc = int(self.title_docs[row])
+        return doc if normalize_title(self.title(doc)) == key else -1
+
+    def redirect(self, row: int) -> tuple:
+        """(source, target) titles of the redirect in `row`"""
+        entry = self.redirects[row]
+        start = int(entry["offset"])
+        source, _, target = self.redirect_text[start:start + int(entry["bytes"])].tobytes().decode("utf-8").partition("\n")
+        return source, target
+
+    def find_redirect(self, key: str) -> str:
+        """Target of the redirect from the normalized title `key` ("" if there is none)"""
+        row = self._find(self.redirect_keys, key_hash(key))
+        if row < 0:
+            return ""
+        source, target = self.redirect(row)
+        return target if normalize_title(source) == key else ""
+
+    def title(self, doc: int) -> str:
+        row = self.docs[doc]
+        start = int(row["offset"])
+        return self.text[start:start + int(row["title_bytes"])].tobytes().decode("utf-8")
+
+    def body(self, doc: int) -> str:
+        row = self.docs[doc]
+        start = int(row["offset"]) + int(row["title_bytes"])
+        return self.text[start:start + int(row["text_bytes"])].tobytes().decode("utf-8")
+
+    @staticmethod
+    def write(path: str, pages: list[dict]):
+        """Write `pages` ({"title", "text"} or {"title", "redirect"}) as a segment at `path`"""
+        temp_path = f"{path}.tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+
+        docs, titles, redirects, postings = [], {}, {}, {}
+        offset = 0
+        with open(os.path.join(temp_path, "text.bin"), "wb") as text_file:
+            for page in pages:
+                key = normalize_title(page["title"])
+                if page.get("redirect"):
+                    redirects[key] = f"{page['title']}\n{page['redirect']}"
+                    continue
+                counts = {}
+                for token in tokenize(page["title"]):
+                    counts[token] = counts.get(token, 0) + TITLE_WEIGHT
+                for token in tokenize(page["text"]):
+                    counts[token] = counts.get(token, 0) + 1
+                doc = len(docs)
+                for token, count in counts.items():
+                    postings.setdefault(token, []).append((doc, count))
+                title_bytes, text_bytes = page["title"].encode("utf-8"), page["text"].encode("utf-8")
+                text_file.write(title_bytes)
+                text_file.write(text_bytes)
+                docs.append((offset, len(title_bytes), len(text_bytes), sum(counts.values())))
+                offset += len(title_bytes) + len(text_bytes)
+                titles[key] = doc
+
+        # Postings are laid out in term-key order, so the term table is sorted as it is built
+        hashed_terms = sorted((key_hash(token), token) for token in postings)
+        flat = np.zeros(sum(len(entries) for entries in postings.values()), dtype=POSTING_DTYPE)
+        terms = np.zeros(len(hashed_terms), dtype=TERM_DTYPE)
+        start = 0
+        for row, (_, token) in enumerate(hashed_terms):
+            entries = postings[token]
+            flat[start:start + len(entries)] = entries
+            terms[row] = (start, len(entries))
+            start += len(entries)
+
+        hashed_titles = sorted((key_hash(key), doc) for key, doc in titles.items())
+        hashed_redirects = sorted((key_hash(key), text.encode("utf-8")) for key, text in redirects.items())
+        redirect_rows, offset = [], 0
+        with open(os.path.join(temp_path, "redirects.bin"), "wb") as redirect_file:
+            for _, data in hashed_redirects:
+                redirect_file.write(data)
+                redirect_rows.append((offset, len(data)))
+                offset += len(data)
+
+        arrays = {
+            "docs.npy": np.array(docs, dtype=DOC_DTYPE),
+            "postings.npy": flat,
+            "term_keys.npy": np.array([key for key, _ in hashed_terms], dtype=np.uint64),
+            "terms.npy": terms,
+            "title_keys.npy": np.array([key for key, _ in hashed_titles], dtype=np.uint64),
+            "title_docs.npy": np.array([doc for _, doc in hashed_titles], dtype=np.int32),
+            "redirect_keys.npy": np.array([key for key, _ in hashed_redirects], dtype=np.uint64),
+            "redirects.npy": np.array(redirect_rows, dtype=REDIRECT_DTYPE),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(temp_path, name), array)
+        os.replace(temp_path, path)
+
+
+class LocalIndex:
+    """Offline full-text search over a Wikipedia dump, stored as an on-disk inverted index.
+
+    The index is a list of segments named in manifest.json. `add` writes new
+    segments without touching existing ones; a page in a newer segment replaces the
+    page with the same title in older ones. `search` ranks pages with BM25 and
+    `page_text` looks a page up by title, so the index can stand in for
+    WikipediaClient; the coroutine versions run in a worker thread. Segments are
+    opened on first use, and a running process picks up segments added by another
+    process on its next lookup.
+    """
+
+    def __init__(self, directory: str = None, k1: float = 1.2, b: float = 0.75):
+        self.directory = directory or Config.LOCAL_INDEX_DIR
+        self.k1 = k1
+        self.b = b
+        self.segments = []
+        self.document_count = 0
+        self.average_length = 1.0
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, "manifest.json")
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"segments": [], "next_segment": 1}
+
+    def _write_manifest(self, manifest: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def _reload(self) -> tuple:
+        """The current (segments, document_count, average_length), reopened if the manifest changed"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime != self._manifest_mtime:
+                self._open_segments(self._read_manifest()["segments"])
+                self._manifest_mtime = mtime
+            return self.segments, self.document_count, self.average_length
+
+    def _open_segments(self, names: list[str]):
+        segments = [Segment(os.path.join(self.directory, name)) for name in names]
+
+        # Newer segments win: sort every title and redirect key by (key, newest segment first)
+        # and hide each title that isn't the first entry for its key
+        keys, owners, docs = [], [], []
+        for number, segment in enumerate(segments):
+            keys += [segment.title_keys, segment.redirect_keys]
+            owners.append(np.full(len(segment.title_keys) + len(segment.redirect_keys), number, dtype=np.int32))
+            docs += [segment.title_docs, np.full(len(segment.redirect_keys), -1, dtype=np.int32)]
+        if segments:
+            keys, owners, docs = np.concatenate(keys), np.concatenate(owners), np.concatenate(docs)
+            order = np.lexsort((-owners, keys))
+            replaced = np.zeros(len(order), dtype=bool)
+            replaced[1:] = keys[order][1:] == keys[order][:-1]
+            replaced = order[replaced]
+            for number, segment in enumerate(segments):
+                hidden = docs[replaced[owners[replaced] == number]]
+                segment.live[hidden[hidden >= 0]] = False
+
+        live_lengths = [segment.docs["length"][segment.live] for segment in segments]
+        document_count = sum(len(lengths) for lengths in live_lengths)
+        total_length = sum(int(lengths.sum()) for lengths in live_lengths)
+        self.segments = segments
+        self.document_count = document_count
+        self.average_length = total_length / document_count if document_count else 1.0
+
+    def add(self, pages: Iterable[dict], segment_docs: int = None, replace: bool = False) -> int:
+        """Index `pages` as new segments of at most `segment_docs` pages; returns the page count.
+
+        With `replace`, the new segments take the place of all existing ones once
+        every page is written, and the old segments are deleted.
+        """
+        segment_docs = segment_docs or Config.LOCAL_INDEX_SEGMENT_DOCS
+        manifest = self._read_manifest()
+        old_names, new_names = list(manifest["segments"]), []
+        added, batch = 0, []
+
+        def flush():
+            name = f"segment_{manifest['next_segment']:06d}"
+            # Persist the counter before writing, so an interrupted run never reuses the name
+            manifest["next_segment"] += 1
+            self._write_manifest(manifest)
+            Segment.write(os.path.join(self.directory, name), batch)
+            new_names.append(name)
+            if not replace:
+                # Publish each segment as soon as it is written, so a long update is searchable as it goes
+                manifest["segments"].append(name)
+                self._write_manifest(manifest)
+            print(f"Wrote {name} ({len(batch)} pages)")
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._remove_orphans(manifest)
+        for page in pages:
+            batch.append(page)
+            added += 1
+            if len(batch) >= segment_docs:
+                flush()
+                batch = []
+        if batch:
+            flush()
+        if replace:
+            manifest["segments"] = new_names
+            self._write_manifest(manifest)
+            for name in old_names:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        self._reload()
+        return added
+
+    def _remove_orphans(self, manifest: dict):
+        """Delete segments left behind by an interrupted build, update or merge"""
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("segment_") and entry.name not in manifest["segments"]:
+                print(f"Removing unfinished segment {entry.name}")
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def merge(self, segment_docs: int = None) -> int:
+        """Rewrite the live pages of every segment into fresh segments, dropping replaced ones"""
+        segments, _, _ = self._reload()
+
+        def live_pages():
+            for segment in segments:
+                for row in range(len(segment.redirects)):
+                    title, target = segment.redirect(row)
+                    yield {"title": title, "redirect": target}
+                for doc in np.flatnonzero(segment.live):
+                    yield {"title": segment.title(doc), "text": segment.body(doc)}
+
+        return self.add(live_pages(), segment_docs, replace=True)
+
+    def search_sync(self, query: str, limit: int = 3) -> list:
+        """The `limit` best pages for `query` by BM25, as dicts with 'title' and 'snippet'"""
+        segments, document_count, average_length = self._reload()
+        query_terms = set(tokenize(query))
+        if not query_terms or not document_count:
+            return []
+        # (segment, term) -> postings range, for the terms each segment contains
+        ranges = {
+            (number, term): found
+            for number, segment in enumerate(segments) for term in query_terms
+            if (found := segment.term(term)) is not None
+        }
+        document_frequency = {term: sum(count for (_, t), (_, count) in ranges.items() if t == term) for term in query_terms}
+
+        candidates = []
+        for number, segment in enumerate(segments):
+            # Only documents in the query terms' postings are touched, not the whole segment
+            doc_parts, score_parts = [], []
+            for term in query_terms:
+                if (number, term) not in ranges:
+                    continue
+                start, count = ranges[number, term]
+                entries = segment.postings[start:start + count]
+                docs = entries["doc"]
+                tf = entries["tf"].astype(np.float32)
+                norm = self.k1 * (1 - self.b + self.b * segment.docs["length"][docs] / average_length)
+                df = document_frequency[term]
+                idf = np.log1p((document_count - df + 0.5) / (df + 0.5))
+                doc_parts.append(docs)
+                score_parts.append(idf * tf * (self.k1 + 1) / (tf + norm))
+            if not doc_parts:
+                continue
+            docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+            scores[~segment.live[docs]] = 0
+            top = np.argpartition(-scores, min(limit, len(scores)) - 1)[:limit]
+            candidates.extend((float(scores[i]), segment, int(docs[i])) for i in top if scores[i] > 0)
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        return [
+            {"title": segment.title(doc), "snippet": self._snippet(segment.body(doc), query_terms), "score": score}
+            for score, segment, doc in candidates[:limit]
+        ]
+
+    def page_text_sync(self, title: str) -> str:
+        """Plain text of the page titled `title`, following one redirect ("" if not indexed)"""
+        segments, _, _ = self._reload()
+        key = normalize_title(title)
+        for _ in range(2):
+            for segment in reversed(segments):
+                doc = segment.find_title(key)
+                if doc >= 0:
+                    return segment.body(doc)
+                target = segment.find_redirect(key)
+                if target:
+                    key = normalize_title(target)
+                    break
+            else:
+                return ""
+        return ""
+
+    # Same coroutine interface as WikipediaClient, so SearchAgent can use either.
+    # Lookups read memory-mapped files and score with NumPy, so keep them off the event loop
+    async def search(self, query: str, limit: int = 3) -> list:
+        return await asyncio.to_thread(self.search_sync, query, limit)
+
+    async def page_text(self, title: str) -> str:
+        return await asyncio.to_thread(self.page_text_sync, title)
+
+    @staticmethod
+    def _snippet(text: str, query_terms: set, length: int = 200) -> str:
+        """The first sentence mentioning a query term, or the page's opening"""
+        for sentence in re.split(r"(?<=[.!?])\s+", text):
+            if query_terms & set(tokenize(sentence)):
+                return sentence[:length]
+        return text[:length]
+
+
+_shared_index = None
+
+def get_local_index() -> LocalIndex:
+    """Return the process-wide LocalIndex for LOCAL_INDEX_DIR"""
+    global _shared_index
+    if _shared_index is None:
+        _shared_index = LocalIndex()
+        if not os.path.exists(_shared_index.manifest_path):
+            print(f"Local search index at {_shared_index.directory} is empty; build it with search_index.py")
+    return _shared_index
@@ -0,0 +1,188 @@
+import html
+import re
+from collections import OrderedDict
+
+HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+UNORDERED_ITEM = re.compile(r"^\s*[-*+]\s+(.*)$")
+ORDERED_ITEM = re.compile(r"^\s*\d+[.)]\s+(.*)$")
+RULE = re.compile(r"^\s*(?:-{3,}|\*{3,}|_{3,})\s*$")
+
+INLINE_PATTERNS = [
+    (re.compile(r"\*\*(.+?)\*\*|__(.+?)__"), "strong"),
+    (re.compile(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?!\*)|(?<!\w)_(?!\s)(.+?)(?<!\s)_(?!\w)"), "em"),
+]
+LINK = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+CODE_SPAN = re.compile(r"`([^`]+)`")
+
+
+def split_blocks(markdown: str) -> list[str]:
+    """Split markdown into blank-line separated blocks, keeping fenced code blocks whole"""
+    blocks, current, in_fence = [], [], False
+    for line in markdown.replace("\r\n", "\n").split("\n"):
+        if line.strip().startswith("```"):
+            # A fence always starts its own block and ends it when it closes
+            if not in_fence and current:
+                blocks.append("\n".join(current))
+                current = []
+            in_fence = not in_fence
+            current.append(line)
+            if not in_fence:
+                blocks.append("\n".join(current))
+                current = []
+            continue
+        if not line.strip() and not in_fence:
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def render_inline(text: str) -> str:
+    """Escape `text` and apply code spans, links, bold and italics"""
+    # Code spans are set aside first so their contents aren't formatted
+    codes = []
+
+    def stash(match):
+        codes.append(f"<code>{html.escape(match.group(1))}</code>")
+        return f"\x00{len(codes) - 1}\x00"
+
+    # Most lines are plain prose, so skip the patterns whose marker characters are absent
+    if "`" in text:
+        text = CODE_SPAN.sub(stash, text)
+    text = html.escape(text, quote=False)
+    if "](" in text:
+        # The text is already escaped, so only the quote that would end the attribute is left
+        text = LINK.sub(lambda m: f'<a href="{m.group(2).replace(chr(34), "&quot;")}">{m.group(1)}</a>', text)
+    if "*" in text or "_" in text:
+        for pattern, tag in INLINE_PATTERNS:
+            text = pattern.sub(lambda m: f"<{tag}>{m.group(1) or m.group(2)}</{tag}>", text)
+    if codes:
+        text = re.sub(r"\x00(\d+)\x00", lambda m: codes[int(m.group(1))], text)
+    return text
+
+
+def render_block(block: str) -> str:
+    """Render one block from split_blocks to HTML"""
+    lines = block.split("\n")
+    if lines[0].strip().startswith("```"):
+        body = lines[1:-1] if len(lines) > 1 and lines[-1].strip().startswith("```") else lines[1:]
+        return f"<pre><code>{html.escape(chr(10).join(body))}</code></pre>"
+
+    parts, paragraph, items, list_tag = [], [], [], None
+
+    def flush():
+        nonlocal items, list_tag
+        if paragraph:
+            parts.append(f"<p>{render_inline(' '.join(line.strip() for line in paragraph))}</p>")
+            paragraph.clear()
+        if items:
+            parts.append(f"<{list_tag}>" + "".join(f"<li>{render_inline(item)}</li>" for item in items) + f"</{list_tag}>")
+            items, list_tag = [], None
+
+    for line in lines:
+        heading = HEADING.match(line)
+        unordered = UNORDERED_ITEM.match(line)
+        ordered = ORDERED_ITEM.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            parts.append(f"<h{level}>{render_inline(heading.group(2))}</h{level}>")
+        elif RULE.match(line):
+            flush()
+            parts.append("<hr>")
+        elif unordered or ordered:
+            tag = "ul" if unordered else "ol"
+            if paragraph or (list_tag and list_tag != tag):
+                flush()
+            list_tag = tag
+            items.append((unordered or ordered).group(1))
+        elif line.startswith(">"):
+            flush()
+            parts.append(f"<blockquote>{render_inline(line.lstrip('> '))}</blockquote>")
+        elif items and line.startswith((" ", "\t")):
+            # Continuation of the previous list item
+            items[-1] += " " + line.strip()
+        else:
+            if items:
+                flush()
+            paragraph.append(line)
+    flush()
+    return "\n".join(parts)
+
+
+def render_markdown(markdown: str) -> str:
+    """Render a markdown report to HTML (headings, paragraphs, lists, quotes, code, links, emphasis)"""
+    return "\n".join(render_block(block) for block in split_blocks(markdown))
+
+
+_rendered = OrderedDict()
+RENDER_CACHE_SIZE = 32
+
+
+def render_markdown_cached(markdown: str) -> str:
+    """render_markdown, memoized for the most recently rendered reports"""
+    rendered = _rendered.get(markdown)
+    if rendered is None:
+        rendered = render_markdown(markdown)
+        remember_rendered(markdown, rendered)
+    else:
+        _rendered.move_to_end(markdown)
+    return rendered
+
+
+def remember_rendered(markdown: str, rendered: str):
+    _rendered[markdown] = rendered
+    _rendered.move_to_end(markdown)
+    while len(_rendered) > RENDER_CACHE_SIZE:
+        _rendered.popitem(last=False)
+
+
+class IncrementalRenderer:
+    """Renders markdown that grows by appending, as a streamed report does.
+
+    Blocks followed by a blank line (outside a code fence) can no longer change, so
+    they are rendered once and kept; each call only re-renders the trailing block.
+    The output matches render_markdown on the same text.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.markdown = ""
+        self._blocks_html = []
+        self._final_upto = 0
+
+    def render(self, markdown: str) -> str:
+        """Render the whole document so far; `markdown` normally extends the previous call's"""
+        if not markdown.startswith(self.markdown):
+            self.reset()
+        self.markdown = markdown
+
+        pending = markdown[self._final_upto:]
+        boundary = self._last_block_boundary(pending)
+        if boundary:
+            self._blocks_html.extend(render_block(block) for block in split_blocks(pending[:boundary]))
+            self._final_upto += boundary
+            pending = pending[boundary:]
+
+        tail = [render_block(block) for block in split_blocks(pending)]
+        return "\n".join(self._blocks_html + tail)
+
+    @staticmethod
+    def _last_block_boundary(text: str) -> int:
+        """Offset just past the last blank line that is outside a code fence, or 0"""
+        boundary, offset, in_fence, previous_blank = 0, 0, False, False
+        for line in text.split("\n")[:-1]:
+            offset += len(line) + 1
+            if line.strip().startswith("```"):
+                in_fence = not in_fence
+            blank = not line.strip()
+            if blank and not in_fence and not previous_blank:
+                boundary = offset
+            previous_blank = blank
+        return boundary
@@ -1,35 +1,166 @@
 import google.generativeai as genai
-import asyncio
-import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Optional, Type
+from utils.cache import ResponseCache
 from utils.config import Config
+from utils.rate_limiter import RateLimiter, estimate_tokens
+from utils.structured_output import Model, StructuredOutputError, parse_model, parse_stats, repair_prompt
+from utils.tracing import tracer
 
-class GeminiProvider:
-    def __init__(self):
+class ModelProvider(ABC):
+    """The interface agents use to call an LLM; GeminiProvider is the production implementation"""
+
+    @abstractmethod
+    async def generate_content(self, prompt: str, system_prompt: str = None, use_cache: bool = False, **kwargs) -> str:
+        pass
+
+    @abstractmethod
+    def stream_content(self, prompt: str, system_prompt: str = None, use_cache: bool = False, **kwargs) -> AsyncIterator[str]:
+        pass
+
+    @abstractmethod
+    def get_model_name(self) -> str:
+        pass
+
+    async def generate_structured(self, prompt: str, schema: Type[Model], system_prompt: str = None,
+                                  use_cache: bool = False,
+                                  fallback: Callable[[str], Model] = None) -> Optional[Model]:
+        """Generate a JSON response constrained to the pydantic `schema` and validate it.
+
+        A response that doesn't validate gets up to STRUCTURED_OUTPUT_MAX_REPAIRS follow-up
+        calls showing the model its error. If none validates, returns `fallback` applied to
+        the last raw response, or None without one. Only validated responses are cached.
+        """
+        response_cache = getattr(self, "response_cache", None)
+        cache_key = None
+        if use_cache and response_cache is not None:
+            cache_key = ResponseCache.make_key(self.get_model_name(), system_prompt, prompt, schema, "structured")
+            cached = await response_cache.aget(cache_key)
+            if cached is not None:
+                return schema.model_validate_json(cached)
+
+        generation_config = {"response_mime_type": "application/json", "response_schema": schema}
+        request = prompt
+        with tracer.span("structured_output", schema=schema.__name__) as span:
+            for attempt in range(Config.STRUCTURED_OUTPUT_MAX_REPAIRS + 1):
+                response = await self.generate_content(request, system_prompt, generation_config=generation_config)
+                try:
+                    result = parse_model(response, schema)
+                except StructuredOutputError as e:
+                    print(f"Invalid {schema.__name__} response (attempt {attempt + 1}): {str(e)[:200]}")
+                    request = repair_prompt(prompt, response, e)
+                    continue
+                parse_stats[f"{schema.__name__}.{'repaired' if attempt else 'parsed'}"] += 1
+                span.set_attribute("repairs", attempt)
+                if cache_key is not None:
+                    await response_cache.aset(cache_key, result.model_dump_json())
+                return result
+
+            parse_stats[f"{schema.__name__}.failed"] += 1
+            span.set_attribute("repairs", Config.STRUCTURED_OUTPUT_MAX_REPAIRS)
+            span.set_attribute("failed", True)
+            return fallback(response) if fallback is not None else None
+
+class GeminiProvider(ModelProvider):
+    def __init__(self, rate_limiter: RateLimiter = None, response_cache: ResponseCache = None):
         genai.configure(api_key=Config.GOOGLE_API_KEY)
         self.model_name = Config.GEMINI_MODEL
         self.model = genai.GenerativeModel(self.model_name)
-        self.last_request_time = 0
-        self.request_delay = 2  # Add delay between requests to avoid rate limiting
-    
-    async def generate_content(self, prompt: str, system_prompt: str = None, **kwargs):
-        # Add delay to avoid rate limiting
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        if time_since_last_request < self.request_delay:
-            await asyncio.sleep(self.request_delay - time_since_last_request)
-        
+        self.rate_limiter = rate_limiter or RateLimiter(
+            requests_per_minute=Config.GEMINI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=Config.GEMINI_TOKENS_PER_MINUTE,
+            max_concurrency=Config.GEMINI_MAX_CONCURRENCY
+        )
+        self.response_cache = response_cache or ResponseCache(
+            path=Config.LLM_CACHE_PATH,
+            ttl=Config.LLM_CACHE_TTL,
+            max_entries=Config.LLM_CACHE_MAX_ENTRIES
+        )
+
+    async def generate_content(self, prompt: str, system_prompt: str = None, use_cache: bool = False, **kwargs):
         full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
-        
+        estimated_tokens = estimate_tokens(full_prompt)
+
+        with tracer.span("gemini.generate_content", model=self.model_name, prompt_chars=len(full_prompt)) as span:
+            cache_key = None
+            if use_cache:
+                cache_key = ResponseCache.make_key(self.model_name, system_prompt, prompt, kwargs)
+                cached = await self.response_cache.aget(cache_key)
+                span.set_attribute("cache_hit", cached is not None)
+                if cached is not None:
+                    span.set_attribute("response_chars", len(cached))
+                    return cached
+
+            try:
+                async with self.rate_limiter.limit(estimated_tokens) as usage:
+                    span.set_attribute("throttle_wait_seconds", usage["wait_time"])
+                    response = await self.model.generate_content_async(full_prompt, **kwargs)
+                    usage_metadata = getattr(response, "usage_metadata", None)
+                    if usage_metadata is not None:
+                        usage["actual_tokens"] = usage_metadata.prompt_token_count
+                text = response.text
+            except Exception as e:
+                print(f"Error generating content: {e}")
+                span.set_attribute("fallback", True)
+                span.error = f"{type(e).__name__}: {e}"
+                # Fallback response if API fails (never cached, so the next call retries)
+                return self._create_fallback_response(full_prompt)
+
+            span.set_attribute("response_chars", len(text))
+            if cache_key is not None and text:
+                await self.response_cache.aset(cache_key, text)
+            return text
+
+    async def stream_content(self, prompt: str, system_prompt: str = None, use_cache: bool = False, **kwargs) -> AsyncIterator[str]:
+        """Like generate_content, but yields the response text in chunks as Gemini produces it"""
+        full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+        estimated_tokens = estimate_tokens(full_prompt)
+        # This generator yields while the span is open, so the span is never made current
+        span = tracer.start_span("gemini.stream_content", model=self.model_name, prompt_chars=len(full_prompt))
+        response_chars = 0
+
         try:
-            # For longer responses, use streaming to avoid timeouts
-            response = await self.model.generate_content_async(full_prompt, **kwargs)
-            self.last_request_time = time.time()
-            return response.text
-        except Exception as e:
-            print(f"Error generating content: {e}")
-            # Fallback response if API fails
-            return self._create_fallback_response(full_prompt)
-    
+            cache_key = None
+            if use_cache:
+                cache_key = ResponseCache.make_key(self.model_name, system_prompt, prompt, kwargs, "stream")
+                cached = await self.response_cache.aget(cache_key)
+                span.set_attribute("cache_hit", cached is not None)
+                if cached is not None:
+                    response_chars = len(cached)
+                    yield cached
+                    return
+
+            chunks = []
+            try:
+                async with self.rate_limiter.limit(estimated_tokens) as usage:
+                    span.set_attribute("throttle_wait_seconds", usage["wait_time"])
+                    response = await self.model.generate_content_async(full_prompt, stream=True, **kwargs)
+                    async for chunk in response:
+                        text = chunk.text if chunk.parts else ""
+                        if text:
+                            if not chunks:
+                                span.set_attribute("time_to_first_chunk_seconds", span.duration)
+                            chunks.append(text)
+                            response_chars += len(text)
+                            yield text
+                    usage_metadata = getattr(response, "usage_metadata", None)
+                    if usage_metadata is not None:
+                        usage["actual_tokens"] = usage_metadata.prompt_token_count
+            except Exception as e:
+                print(f"Error streaming content: {e}")
+                span.error = f"{type(e).__name__}: {e}"
+                # Only fall back if nothing was streamed yet; never cache a partial or canned response
+                if not chunks:
+                    span.set_attribute("fallback", True)
+                    yield self._create_fallback_response(full_prompt)
+                return
+
+            if cache_key is not None and chunks:
+                await self.response_cache.aset(cache_key, "".join(chunks))
+        finally:
+            span.set_attribute("response_chars", response_chars)
+            tracer.end_span(span)
+
     def _create_fallback_response(self, prompt: str) -> str:
         """Create a fallback response when the API fails"""
         if "search" in prompt.lower() and "summary" in prompt.lower():
@@ -38,6 +169,15 @@ class GeminiProvider:
             return f"# Research Report\n\n## Summary\n\nThis is a comprehensive report based on the research conducted.\n\n## Detailed Analysis\n\nResearch findings indicate important information about the topic.\n\n## Conclusion\n\nFurther research may be needed to explore additional aspects."
         else:
             return "I apologize, but I'm experiencing technical difficulties. Please try again later."
-    
+
     def get_model_name(self):
-        return self.model_name
\ No newline at end of file
+        return self.model_name
+
+_shared_provider = None
+
+def get_shared_provider() -> GeminiProvider:
+    """Return the process-wide GeminiProvider so every request shares one rate limit"""
+    global _shared_provider
+    if _shared_provider is None:
+        _shared_provider = GeminiProvider()
+    return _shared_provider
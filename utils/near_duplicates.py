@@ -0,0 +1,73 @@
+import re
+import zlib
+from utils.config import Config
+
+STOPWORDS = {"a", "an", "and", "the", "of", "in", "on", "for", "to", "about", "with", "by", "at", "from", "vs"}
+
+
+def content_words(text: str) -> list[str]:
+    """Lowercased non-stopwords, with a plural "s" dropped so "ethic" and "ethics" match"""
+    words = [word for word in re.findall(r"\w+", text.casefold()) if word not in STOPWORDS]
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word for word in words]
+
+
+def shingles(text: str, size: int = 3, exclude: set = frozenset()) -> set:
+    """Character `size`-grams of each content word not in `exclude`, so word order and inflection matter little"""
+    words = [word for word in content_words(text) if word not in exclude]
+    grams = set()
+    for word in words:
+        padded = f" {word} "
+        grams.update(padded[i:i + size] for i in range(max(1, len(padded) - size + 1)))
+    return grams
+
+
+class MinHasher:
+    """MinHash signatures: the fraction of matching positions estimates Jaccard similarity"""
+
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, num_hashes: int = 64, seed: int = 1):
+        # Fixed linear hash family so signatures are stable across processes
+        state = seed
+        self.params = []
+        for _ in range(num_hashes):
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            a = state % (self.PRIME - 1) + 1
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            self.params.append((a, state % self.PRIME))
+
+    def signature(self, grams: set) -> tuple:
+        hashes = [zlib.crc32(gram.encode("utf-8")) for gram in grams] or [0]
+        return tuple(min((a * h + b) % self.PRIME for h in hashes) for a, b in self.params)
+
+    @staticmethod
+    def similarity(first: tuple, second: tuple) -> float:
+        return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+_hasher = MinHasher()
+
+
+def select_distinct(texts: list[str], limit: int, threshold: float = None, topic: str = "") -> tuple[list[int], int]:
+    """Pick up to `limit` texts in order, skipping any too similar to one already picked.
+
+    Words of `topic` (the user's query) are left out of the comparison, so searches
+    that share a long topic are told apart by the words that differ. Texts that
+    add nothing to the topic all count as duplicates of each other.
+
+    Returns the indices picked and how many texts were skipped as near-duplicates
+    (texts beyond `limit` that were never compared don't count).
+    """
+    threshold = Config.SEARCH_DEDUP_THRESHOLD if threshold is None else threshold
+    topic_words = set(content_words(topic))
+    kept, signatures, removed = [], [], 0
+    for index, text in enumerate(texts):
+        if len(kept) >= limit:
+            break
+        signature = _hasher.signature(shingles(text, exclude=topic_words))
+        if any(MinHasher.similarity(signature, other) >= threshold for other in signatures):
+            removed += 1
+            continue
+        kept.append(index)
+        signatures.append(signature)
+    return kept, removed
@@ -0,0 +1,94 @@
+import re
+import numpy as np
+from utils.config import Config
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "he", "in", "is", "it", "its",
+    "of", "on", "or", "that", "the", "to", "was", "were", "which", "will", "with", "this", "these", "their",
+    "about", "what", "how", "why", "who", "into", "also", "can", "more", "such", "other", "than",
+}
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in re.findall(r"\w+", text.casefold()) if token not in STOPWORDS and len(token) > 1]
+
+
+def split_passages(text: str, target_chars: int = None) -> list[str]:
+    """Chunk an article into passages of about `target_chars`, along paragraph and sentence boundaries"""
+    target_chars = target_chars or Config.SEARCH_PASSAGE_CHARS
+    passages, current = [], ""
+    for paragraph in (p.strip() for p in text.split("\n")):
+        # Skip blank lines and plain-text section headings ("== History ==" or short title lines)
+        if not paragraph or paragraph.startswith("=") or len(paragraph) < 40 and not paragraph.endswith("."):
+            continue
+        pieces = [paragraph] if len(paragraph) <= target_chars else SENTENCE_END.split(paragraph)
+        for piece in pieces:
+            if current and len(current) + len(piece) + 1 > target_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current} {piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+class BM25Index:
+    """Okapi BM25 over a small set of passages, scored with NumPy array operations"""
+
+    def __init__(self, passages: list[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        rows, columns = [], []
+        for row, passage in enumerate(passages):
+            for token in tokenize(passage):
+                rows.append(row)
+                columns.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+
+        self.term_frequencies = np.zeros((len(passages), max(1, len(self.vocabulary))), dtype=np.float32)
+        np.add.at(self.term_frequencies, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), 1)
+        lengths = self.term_frequencies.sum(axis=1)
+        self.length_norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()) if len(passages) else 0.0, 1.0))
+        document_frequency = (self.term_frequencies > 0).sum(axis=0)
+        self.idf = np.log1p((len(passages) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def score(self, weighted_terms: dict) -> np.ndarray:
+        """BM25 score of every passage for {term: query weight}; unknown terms are ignored"""
+        known = [(self.vocabulary[term], weight) for term, weight in weighted_terms.items() if term in self.vocabulary]
+        if not known:
+            return np.zeros(self.term_frequencies.shape[0], dtype=np.float32)
+        columns = np.array([column for column, _ in known], dtype=np.intp)
+        weights = np.array([weight for _, weight in known], dtype=np.float32)
+        tf = self.term_frequencies[:, columns]
+        saturated = tf * (self.k1 + 1) / (tf + self.length_norm[:, None])
+        return saturated @ (self.idf[columns] * weights)
+
+
+def top_passages(text: str, search_term: str, reason: str = "", top_k: int = None, max_chars: int = None) -> list[str]:
+    """The passages of `text` most relevant to the search term (and, at lower weight, the reason).
+
+    Picks up to `top_k` passages by score within `max_chars` and returns them in
+    article order; if nothing matches, returns the article's opening passage.
+    """
+    top_k = top_k or Config.SEARCH_PASSAGES_TOP_K
+    max_chars = max_chars or Config.SEARCH_PASSAGE_BUDGET
+    passages = split_passages(text)
+    if not passages:
+        return []
+
+    weighted_terms = {term: 0.5 for term in tokenize(reason)}
+    weighted_terms.update({term: 1.0 for term in tokenize(search_term)})
+    scores = BM25Index(passages).score(weighted_terms)
+
+    chosen, used = [], 0
+    for index in np.argsort(-scores, kind="stable"):
+        if len(chosen) >= top_k or scores[index] <= 0:
+            break
+        if used + len(passages[index]) > max_chars:
+            continue
+        chosen.append(int(index))
+        used += len(passages[index])
+    if not chosen:
+        return [passages[0][:max_chars]]
+    return [passages[index] for index in sorted(chosen)]
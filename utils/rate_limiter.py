@@ -0,0 +1,118 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+
+class TokenBucket:
+    """A bucket that refills continuously at `per_minute` tokens per minute, up to `capacity`"""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def time_until_available(self, amount: float) -> float:
+        """Seconds to wait before `amount` tokens can be taken (0 if they are available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        """Return (or, with a negative amount, additionally charge) tokens after the fact"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits plus a cap on in-flight calls.
+
+    Callers are admitted strictly in arrival order: whoever is at the head of the
+    queue holds the queue lock while it waits for a concurrency slot and for both
+    buckets to have room, so a burst of callers can't all read the same stale state.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_concurrency: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._queue_lock = asyncio.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.total_requests = 0
+        self.total_wait_time = 0.0
+
+    async def acquire(self, estimated_tokens: int) -> float:
+        """Wait for a slot and for budget in both buckets; returns the time spent waiting"""
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._queue_lock:
+                await self._slots.acquire()
+                try:
+                    while True:
+                        delay = max(
+                            self.requests.time_until_available(1),
+                            self.tokens.time_until_available(estimated_tokens)
+                        )
+                        if delay <= 0:
+                            break
+                        await asyncio.sleep(delay)
+                except BaseException:
+                    self._slots.release()
+                    raise
+                self.requests.consume(1)
+                self.tokens.consume(estimated_tokens)
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - start
+        self.in_flight += 1
+        self.total_requests += 1
+        self.total_wait_time += waited
+        return waited
+
+    def release(self, estimated_tokens: int = 0, actual_tokens: int = None):
+        """Free the concurrency slot and reconcile the token estimate with real usage"""
+        self.in_flight -= 1
+        self._slots.release()
+        if actual_tokens is not None:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+
+    @asynccontextmanager
+    async def limit(self, estimated_tokens: int):
+        """Hold a rate-limited slot for the duration of the block.
+
+        The yielded dict carries `wait_time`; set `actual_tokens` on it to correct
+        the token bucket once the real usage is known.
+        """
+        usage = {"wait_time": await self.acquire(estimated_tokens), "actual_tokens": None}
+        try:
+            yield usage
+        finally:
+            self.release(estimated_tokens, usage["actual_tokens"])
+
+    def get_stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "total_requests": self.total_requests,
+            "average_wait_time": self.total_wait_time / self.total_requests if self.total_requests else 0
+        }
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about four characters per token)"""
+    return max(1, len(text) // 4)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Iterator, Optional
+from utils.config import Config
+from utils.markdown_renderer import render_markdown_cached
+from agents.writer_agent import ReportData
+
+
+class ReportExporter:
+    """Writes reports to a bounded, self-cleaning export directory.
+
+    Files are named by a hash of the report and format, so exporting the same report
+    again returns the existing file without rewriting it. After each new export,
+    files older than `max_age` seconds are deleted, then the oldest beyond `max_files`.
+    Temp files left by an interrupted export are deleted once older than `max_age`.
+    """
+
+    FORMATS = {"md": "text/markdown", "html": "text/html", "json": "application/json"}
+    # Cleanup only ever touches finished exports and stale temp files, never other files
+    EXPORT_NAME = re.compile(r"^research_report_[0-9a-f]{16}\.(?:md|html|json)$")
+    TEMP_NAME = re.compile(r"^\.export_.*\.tmp$")
+
+    def __init__(self, directory: str = None, max_files: int = None, max_age: float = None):
+        self.directory = directory or Config.EXPORT_DIR
+        self.max_files = max_files or Config.EXPORT_MAX_FILES
+        self.max_age = max_age or Config.EXPORT_MAX_AGE
+        os.makedirs(self.directory, exist_ok=True)
+
+    def export(self, report: ReportData, fmt: str = "md") -> Optional[str]:
+        """Write `report` as `fmt` (md, html or json) and return the file path"""
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        digest = hashlib.sha256(f"{fmt}\n{report.model_dump_json()}".encode("utf-8")).hexdigest()[:16]
+        path = os.path.join(self.directory, f"research_report_{digest}.{fmt}")
+
+        if os.path.exists(path):
+            # Same content already exported: refresh its age so cleanup keeps it
+            os.utime(path)
+            return path
+
+        # A unique temp name, so concurrent exports of the same report don't share a file
+        f = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=self.directory, prefix=".export_", suffix=".tmp", delete=False
+        )
+        try:
+            with f:
+                for chunk in self._chunks(report, fmt):
+                    f.write(chunk)
+            os.replace(f.name, path)
+        except BaseException:
+            # Don't leave a partial file behind (disk full, encoding error, cancelled run)
+            os.unlink(f.name)
+            raise
+        self._cleanup()
+        return path
+
+    def _chunks(self, report: ReportData, fmt: str) -> Iterator[str]:
+        """The export's content piece by piece, so it is written without building it all in memory"""
+        if fmt == "md":
+            yield report.markdown_report
+        elif fmt == "html":
+            yield "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Research Report</title></head>\n"
+            yield "<body style=\"font-family: Arial, Helvetica, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto;\">\n"
+            yield render_markdown_cached(report.markdown_report)
+            yield "\n</body></html>\n"
+        else:
+            yield from json.JSONEncoder(indent=2, ensure_ascii=False).iterencode(report.model_dump())
+
+    def _cleanup(self):
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if self.TEMP_NAME.match(entry.name):
+                # An export that failed without removing its temp file; recent ones may still be in progress
+                if now - entry.stat().st_mtime > self.max_age:
+                    self._remove(entry.path)
+                continue
+            if not self.EXPORT_NAME.match(entry.name):
+                continue
+            modified = entry.stat().st_mtime
+            if now - modified > self.max_age:
+                self._remove(entry.path)
+            else:
+                files.append((modified, entry.path))
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_files)]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Could not remove old export {path}: {e}")
@@ -0,0 +1,279 @@
+import asyncio
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+from urllib.parse import quote
+from utils.analytics import LatencyHistogram
+from utils.config import Config
+from utils.http_pool import HttpPool, get_http_pool
+from utils.local_index import get_local_index
+from utils.single_flight import SingleFlight
+from utils.tracing import tracer
+from utils.wikipedia_client import WikipediaClient
+
+
+class SearchBackend(ABC):
+    """A source of search results, called through `lookup`.
+
+    Subclasses implement `_lookup(query)`, returning the raw result dict cached by
+    SearchCache: {"page_text": str, "search_hits": [{"title", "snippet", "url"}]}.
+    `lookup` applies the backend's timeout and keeps its latency and error counts.
+    """
+
+    name = "backend"
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout or Config.SEARCH_BACKEND_TIMEOUT
+        self.latency = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    async def lookup(self, query: str) -> Optional[dict]:
+        """The backend's results for `query`, or None if it failed or timed out"""
+        self.requests += 1
+        started = time.perf_counter()
+        with tracer.span("search.backend", backend=self.name) as span:
+            try:
+                raw = await asyncio.wait_for(self._lookup(query), self.timeout)
+            # Slow outcomes are recorded too, or the p90 used for hedging would only
+            # ever see the fast answers and keep drifting down
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.latency.record(self.timeout)
+                span.set_attribute("outcome", "timeout")
+                print(f"{self.name} search timed out after {self.timeout}s")
+                return None
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                self.latency.record(time.perf_counter() - started)
+                span.set_attribute("outcome", "cancelled")
+                raise
+            except Exception as e:
+                self.errors += 1
+                span.set_attribute("outcome", "error")
+                print(f"{self.name} search error: {e}")
+                return None
+            self.latency.record(time.perf_counter() - started)
+            span.set_attribute("hits", len(raw["search_hits"]))
+            return raw
+
+    @abstractmethod
+    async def _lookup(self, query: str) -> dict:
+        pass
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long to wait before hedging this backend, once enough latencies are known"""
+        if self.latency.count < Config.SEARCH_HEDGE_MIN_SAMPLES:
+            return None
+        return self.latency.percentile(Config.SEARCH_HEDGE_PERCENTILE)
+
+    def get_stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "latency": self.latency.summary()
+        }
+
+
+class WikipediaBackend(SearchBackend):
+    """The article for the query (or for its best search hit) plus the top search hits"""
+
+    name = "wikipedia"
+
+    def __init__(self, client=None, timeout: float = None):
+        super().__init__(timeout)
+        self.client = client or WikipediaClient()
+        self.page_url = re.sub(r"/w/api\.php$", "", getattr(self.client, "api_url", Config.WIKIPEDIA_API_URL)) + "/wiki/"
+
+    async def _lookup(self, query: str) -> dict:
+        # The direct page lookup and the search are independent, so issue them together
+        page_text, search_hits = await asyncio.gather(
+            self.client.page_text(query),
+            self.client.search(query, limit=3),
+            return_exceptions=True
+        )
+        if isinstance(page_text, Exception) and isinstance(search_hits, Exception):
+            raise page_text
+        if isinstance(page_text, Exception):
+            print(f"{self.name} page error: {page_text}")
+            page_text = ""
+        if isinstance(search_hits, Exception):
+            print(f"{self.name} search error: {search_hits}")
+            search_hits = []
+
+        # If the direct page doesn't exist, fall back to the first search result's page
+        if not page_text and search_hits:
+            page_text = await self.client.page_text(search_hits[0]['title'])
+
+        return {
+            "page_text": page_text,
+            "search_hits": [
+                {
+                    "title": hit.get("title", ""),
+                    "snippet": hit.get("snippet", ""),
+                    "url": self.page_url + quote(hit.get("title", "").replace(" ", "_"))
+                }
+                for hit in search_hits
+            ]
+        }
+
+
+class LocalIndexBackend(WikipediaBackend):
+    """The offline index built by search_index.py, answering like the Wikipedia API would"""
+
+    name = "local"
+
+    def __init__(self, index=None, timeout: float = None):
+        super().__init__(index or get_local_index(), timeout)
+
+
+class DuckDuckGoBackend(SearchBackend):
+    """DuckDuckGo's Instant Answer API: an abstract of the topic and related links"""
+
+    name = "duckduckgo"
+
+    def __init__(self, http_pool: HttpPool = None, api_url: str = None, timeout: float = None,
+                 single_flight: SingleFlight = None):
+        super().__init__(timeout)
+        self.http_pool = http_pool or get_http_pool()
+        self.api_url = api_url or Config.DUCKDUCKGO_API_URL
+        self.single_flight = single_flight or SingleFlight()
+
+    async def _lookup(self, query: str) -> dict:
+        params = {"q": query, "format": "json", "no_html": "1", "no_redirect": "1", "skip_disambig": "1"}
+        # Identical searches already in flight share one request
+        data = await self.single_flight.do(
+            (self.api_url, tuple(sorted(params.items()))), lambda: self._request(params)
+        )
+
+        hits = []
+        for topic in data.get("Results", []) + data.get("RelatedTopics", []):
+            # Related topics are either links or named groups of links
+            for entry in topic.get("Topics", [topic]):
+                text, url = entry.get("Text", ""), entry.get("FirstURL", "")
+                if text and url:
+                    title, _, snippet = text.partition(" - ")
+                    hits.append({"title": title, "snippet": snippet or text, "url": url})
+        return {"page_text": data.get("AbstractText", ""), "search_hits": hits[:3]}
+
+    async def _request(self, params: dict) -> dict:
+        session = await self.http_pool.get_session()
+        async with session.get(self.api_url, params=params) as response:
+            if response.status != 200:
+                raise RuntimeError(f"DuckDuckGo API returned status {response.status}")
+            # Served as application/x-javascript, so skip aiohttp's content-type check
+            return await response.json(content_type=None)
+
+
+class SearchRouter:
+    """Queries several backends at once and merges what they return.
+
+    Every backend in `backends` is called concurrently under its own timeout. If
+    one of them is still running after its usual p90 latency, `hedge` (if set) is
+    called too, and once the hedge has answered the router stops waiting for the
+    stragglers. The page text comes from the first backend (in list order) that
+    has one; search hits are concatenated and deduplicated by URL and title. If any
+    backend failed, timed out or was cancelled, the result is marked "incomplete"
+    so it is only cached briefly.
+    """
+
+    def __init__(self, backends: list[SearchBackend], hedge: SearchBackend = None, max_hits: int = None):
+        self.backends = backends
+        self.hedge = hedge
+        self.max_hits = max_hits or Config.SEARCH_MAX_HITS
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    async def fetch(self, query: str) -> dict:
+        with tracer.span("search.backends", backends=len(self.backends)) as span:
+            return await self._fetch(query, span)
+
+    async def _fetch(self, query: str, span) -> dict:
+        started = time.monotonic()
+        tasks = {asyncio.ensure_future(backend.lookup(query)): backend for backend in self.backends}
+        pending = set(tasks)
+        results = {}
+        hedge_task = None
+        try:
+            while pending:
+                hedge_at = self._hedge_at(started, [tasks[task] for task in pending]) if hedge_task is None else None
+                timeout = None if hedge_at is None else max(0.0, hedge_at - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[tasks[task]] = task.result()
+
+                if hedge_task is None and hedge_at is not None and not done:
+                    self.hedges_fired += 1
+                    span.set_attribute("hedged", True)
+                    hedge_task = asyncio.ensure_future(self.hedge.lookup(query))
+                    tasks[hedge_task] = self.hedge
+                    pending.add(hedge_task)
+                elif hedge_task in done and self._usable(results[self.hedge]) and pending:
+                    self.hedges_won += 1
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+        merged = self._merge([results.get(backend) for backend in self.backends + ([self.hedge] if self.hedge else [])])
+        if any(results.get(backend) is None for backend in self.backends):
+            span.set_attribute("incomplete", True)
+            merged["incomplete"] = True
+        return merged
+
+    def _hedge_at(self, started: float, running: list[SearchBackend]) -> Optional[float]:
+        """When to fire the hedge: the earliest p90 of the backends still running"""
+        if self.hedge is None:
+            return None
+        delays = [delay for delay in (backend.hedge_delay() for backend in running) if delay is not None]
+        return started + min(delays) if delays else None
+
+    @staticmethod
+    def _usable(raw: Optional[dict]) -> bool:
+        return raw is not None and any(raw.values())
+
+    def _merge(self, results: list[Optional[dict]]) -> dict:
+        page_text = next((raw["page_text"] for raw in results if raw and raw["page_text"]), "")
+        hits, seen = [], set()
+        for raw in results:
+            for hit in raw["search_hits"] if raw else []:
+                keys = {
+                    re.sub(r"^https?://(www\.)?|/$", "", hit["url"].casefold()),
+                    re.sub(r"\s+", " ", hit["title"].casefold()).strip()
+                } - {""}
+                if keys & seen:
+                    continue
+                seen |= keys
+                hits.append(hit)
+        return {"page_text": page_text, "search_hits": hits[:self.max_hits]}
+
+    def get_stats(self) -> dict:
+        backends = self.backends + ([self.hedge] if self.hedge else [])
+        return {
+            "backends": {backend.name: backend.get_stats() for backend in backends},
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won
+        }
+
+
+def create_backend(name: str, http_pool: HttpPool = None, single_flight: SingleFlight = None) -> SearchBackend:
+    """Build a backend from its SEARCH_BACKENDS name"""
+    if name == "wikipedia":
+        return WikipediaBackend(WikipediaClient(http_pool, single_flight=single_flight))
+    if name == "local":
+        return LocalIndexBackend()
+    if name == "duckduckgo":
+        return DuckDuckGoBackend(http_pool, single_flight=single_flight)
+    raise ValueError(f"Unknown search backend: {name}")
+
+
+def create_search_router(http_pool: HttpPool = None, single_flight: SingleFlight = None) -> SearchRouter:
+    """The router configured by SEARCH_BACKENDS and SEARCH_HEDGE_BACKEND"""
+    return SearchRouter(
+        [create_backend(name, http_pool, single_flight) for name in Config.SEARCH_BACKENDS],
+        hedge=create_backend(Config.SEARCH_HEDGE_BACKEND, http_pool, single_flight) if Config.SEARCH_HEDGE_BACKEND else None
+    )
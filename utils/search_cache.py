@@ -0,0 +1,114 @@
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+from utils.cache import ResponseCache
+from utils.config import Config
+
+
+class SearchCache:
+    """Cache of raw search results keyed by normalized query.
+
+    Entries live in an in-memory LRU and, when `disk_cache` is given, in a
+    persistent tier behind it. Empty results (including ones caused by errors) are
+    cached too, but only for `negative_ttl`, so a failing term isn't re-fetched by
+    every concurrent run yet recovers quickly. So are results flagged "incomplete"
+    because some backend didn't answer.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float, disk_cache: ResponseCache = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.disk_cache = disk_cache
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case-fold, collapse whitespace and trim surrounding punctuation"""
+        query = re.sub(r"\s+", " ", query.casefold()).strip()
+        return query.strip(" .,;:!?\"'")
+
+    @staticmethod
+    def _is_negative(raw: dict) -> bool:
+        return not any(value for key, value in raw.items() if key != "incomplete")
+
+    async def get(self, query: str) -> Optional[dict]:
+        key = self.normalize(query)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.time():
+            del self._entries[key]
+            entry = None
+
+        if entry is None and self.disk_cache is not None:
+            stored = await self.disk_cache.aget(key)
+            if stored is not None:
+                entry = json.loads(stored)
+                self._remember(key, entry[0], entry[1])
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if self._is_negative(entry[1]):
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return entry[1]
+
+    async def set(self, query: str, raw: dict):
+        key = self.normalize(query)
+        ttl = self.negative_ttl if self._is_negative(raw) or raw.get("incomplete") else self.ttl
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, raw)
+        if self.disk_cache is not None:
+            await self.disk_cache.aset(key, json.dumps([expires_at, raw]), ttl=ttl)
+
+    def _remember(self, key: str, expires_at: float, raw: dict):
+        self._entries[key] = (expires_at, raw)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every entry, including the on-disk tier"""
+        self._entries.clear()
+        if self.disk_cache is not None:
+            self.disk_cache.clear()
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.negative_hits) / lookups * 100 if lookups else 0
+        }
+
+
+_shared_cache = None
+
+def get_search_cache() -> SearchCache:
+    """Return the process-wide SearchCache, with a disk tier if SEARCH_CACHE_PATH is set"""
+    global _shared_cache
+    if _shared_cache is None:
+        disk_cache = None
+        if Config.SEARCH_CACHE_PATH:
+            disk_cache = ResponseCache(
+                path=Config.SEARCH_CACHE_PATH,
+                ttl=Config.SEARCH_CACHE_TTL,
+                max_entries=Config.SEARCH_CACHE_MAX_ENTRIES * 10
+            )
+        _shared_cache = SearchCache(
+            max_entries=Config.SEARCH_CACHE_MAX_ENTRIES,
+            ttl=Config.SEARCH_CACHE_TTL,
+            negative_ttl=Config.SEARCH_CACHE_NEGATIVE_TTL,
+            disk_cache=disk_cache
+        )
+    return _shared_cache
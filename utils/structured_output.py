@@ -0,0 +1,51 @@
+import json
+import re
+from collections import Counter
+from typing import Type, TypeVar
+from pydantic import BaseModel, ValidationError
+
+Model = TypeVar("Model", bound=BaseModel)
+
+# Outcome counts per schema ("WebSearchPlan.parsed", "ReportData.repaired", ...)
+parse_stats = Counter()
+
+
+class StructuredOutputError(ValueError):
+    """The response held no JSON object that validates against the expected model"""
+
+
+def extract_json(text: str):
+    """Decode the first complete JSON object in `text`, ignoring code fences and surrounding prose"""
+    text = re.sub(r"```(?:json)?", "", text)
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"\{", text):
+        try:
+            value, _ = decoder.raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+    raise StructuredOutputError("no JSON object found")
+
+
+def parse_model(text: str, schema: Type[Model]) -> Model:
+    """Validate the JSON object in `text` against `schema`, raising StructuredOutputError if it doesn't fit"""
+    try:
+        return schema.model_validate(extract_json(text))
+    except ValidationError as e:
+        raise StructuredOutputError(str(e)) from e
+
+
+def repair_prompt(prompt: str, response: str, error: StructuredOutputError) -> str:
+    """A follow-up prompt showing the model why its previous response was rejected"""
+    return (
+        f"{prompt}\n\n"
+        f"Your previous response could not be used because it was not valid JSON for the required schema "
+        f"({str(error)[:500]}).\n"
+        f"Previous response:\n{response[:2000]}\n\n"
+        f"Return only a corrected JSON object."
+    )
+
+
+def get_parse_stats() -> dict:
+    return dict(parse_stats)
@@ -0,0 +1,166 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Optional
+from utils.config import Config
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation with attributes, identified OpenTelemetry-style by trace and span ids"""
+
+    def __init__(self, name: str, parent: "Span" = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end (or to now, if still open)"""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_dict(self) -> dict:
+        """The span in OTLP/JSON shape, so it can be fed to OpenTelemetry tooling"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or 0),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()
+            ],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class SpanCollector:
+    """Keeps the most recently finished spans in memory"""
+
+    def __init__(self, max_spans: int = 10000):
+        self._spans = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self._spans.append(span)
+
+    def get_spans(self, trace_id: str = None) -> list:
+        return [span for span in self._spans if trace_id is None or span.trace_id == trace_id]
+
+    def clear(self):
+        self._spans.clear()
+
+
+class JsonlSpanExporter:
+    """Appends each finished span to a file as one OTLP/JSON object per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict())
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class Tracer:
+    """Creates spans and hands finished ones to every exporter.
+
+    The current span is tracked in a context variable, so tasks started inside a
+    span become its children. Code that yields while a span is open (async
+    generators) should pass `parent` explicitly or drive the generator through
+    `iterate`, since each step may run in a different task.
+    """
+
+    def __init__(self, exporters: list = None):
+        self.collector = SpanCollector()
+        self.exporters = [self.collector] + list(exporters or [])
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, parent: Span = None, **attributes) -> Span:
+        """Open a span without making it current; call `end_span` when done"""
+        return Span(name, parent or self.current_span(), attributes)
+
+    def end_span(self, span: Span, error: BaseException = None):
+        if span.end_ns is not None:
+            return
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                print(f"Error exporting span: {e}")
+
+    @contextmanager
+    def use_span(self, span: Span):
+        """Make `span` current for the block without ending it"""
+        previous = _current_span.get()
+        _current_span.set(span)
+        try:
+            yield span
+        finally:
+            # set() rather than reset(): the block may finish in a different context
+            _current_span.set(previous)
+
+    @contextmanager
+    def span(self, name: str, parent: Span = None, **attributes):
+        """Open a span, make it current for the block, and end it afterwards"""
+        span = self.start_span(name, parent, **attributes)
+        error = None
+        try:
+            with self.use_span(span):
+                yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.end_span(span, error)
+
+    async def iterate(self, span: Span, iterator: AsyncIterator) -> AsyncIterator:
+        """Drive an async iterator with `span` current during each step"""
+        while True:
+            with self.use_span(span):
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+
+
+tracer = Tracer()
+if Config.TRACE_JSONL_PATH:
+    tracer.add_exporter(JsonlSpanExporter(Config.TRACE_JSONL_PATH))
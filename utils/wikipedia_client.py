@@ -0,0 +1,53 @@
+from utils.config import Config
+from utils.http_pool import HttpPool, get_http_pool
+from utils.single_flight import SingleFlight
+
+
+class WikipediaClient:
+    """Non-blocking access to the Wikipedia action API over the shared HTTP pool.
+
+    Identical requests that are already in flight are coalesced through `single_flight`.
+    """
+
+    def __init__(self, http_pool: HttpPool = None, api_url: str = None, single_flight: SingleFlight = None):
+        self.http_pool = http_pool or get_http_pool()
+        self.api_url = api_url or Config.WIKIPEDIA_API_URL
+        self.single_flight = single_flight or SingleFlight()
+
+    async def _get(self, params: dict) -> dict:
+        params = {**params, "format": "json", "formatversion": "2"}
+        key = (self.api_url, tuple(sorted(params.items())))
+        return await self.single_flight.do(key, lambda: self._request(params))
+
+    async def _request(self, params: dict) -> dict:
+        session = await self.http_pool.get_session()
+        async with session.get(self.api_url, params=params) as response:
+            if response.status != 200:
+                print(f"Wikipedia API returned status {response.status}")
+                return {}
+            return await response.json()
+
+    async def page_text(self, title: str) -> str:
+        """Plain text of the whole page, following redirects ("" if the page doesn't exist)"""
+        data = await self._get({
+            "action": "query",
+            "prop": "extracts",
+            "explaintext": "1",
+            "exsectionformat": "plain",
+            "redirects": "1",
+            "titles": title
+        })
+        pages = data.get("query", {}).get("pages", [])
+        if not pages or pages[0].get("missing") or pages[0].get("invalid"):
+            return ""
+        return pages[0].get("extract", "")
+
+    async def search(self, query: str, limit: int = 3) -> list:
+        """Full-text search; each hit is a dict with at least 'title' and 'snippet'"""
+        data = await self._get({
+            "action": "query",
+            "list": "search",
+            "srsearch": query,
+            "srlimit": str(limit)
+        })
+        return data.get("query", {}).get("search", [])